@@ -0,0 +1,3 @@
+from .result_cache import ResultCache, hash_bytes, hash_file, hash_text, make_key
+
+__all__ = ['ResultCache', 'hash_bytes', 'hash_file', 'hash_text', 'make_key']
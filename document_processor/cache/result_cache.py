@@ -0,0 +1,127 @@
+# document_processor/cache/result_cache.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+def hash_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a UTF-8 string."""
+    return hash_bytes(text.encode('utf-8'))
+
+def hash_file(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_key(*parts: Any) -> str:
+    """Combine key components into a single stable cache key."""
+    return hash_text('\x1f'.join(str(part) for part in parts))
+
+class ResultCache:
+    """
+    Content-addressed, size-bounded on-disk cache for pipeline stage results.
+    
+    Entries are grouped by stage (extraction, section splitting, categorization
+    and summarization) so each stage can be keyed on exactly the inputs it
+    depends on. When the total size exceeds ``max_bytes`` the least recently
+    used entries are evicted until the cache is back under the low-water mark.
+    """
+    
+    STAGES = ('extraction', 'sections', 'categorization', 'summarization')
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024, low_water: float = 0.9):
+        """
+        Initialize the cache.
+        
+        Args:
+            cache_dir: Root directory for cache entries
+            max_bytes: Maximum total size of all entries on disk
+            low_water: Fraction of max_bytes to evict down to once the limit is hit
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(path.stat().st_size for path in self._iter_entries())
+    
+    def _entry_path(self, stage: str, key: str) -> Path:
+        if stage not in self.STAGES:
+            raise ValueError(f"Unknown cache stage: {stage}")
+        return self.cache_dir / stage / key[:2] / f"{key}.json"
+    
+    def _iter_entries(self) -> Iterable[Path]:
+        for stage in self.STAGES:
+            yield from (self.cache_dir / stage).glob('*/*.json')
+    
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """Return the cached value for a stage and key, or None on a miss."""
+        path = self._entry_path(stage, key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+    
+    def put(self, stage: str, key: str, value: Any) -> None:
+        """Store a JSON-serializable value for a stage and key."""
+        path = self._entry_path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(value).encode('utf-8')
+        
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        
+        with self._lock:
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += len(payload) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _evict(self) -> None:
+        """Remove least recently used entries until under the low-water mark."""
+        target = int(self.max_bytes * self.low_water)
+        entries = []
+        for path in self._iter_entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda entry: entry[0])
+        
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+    
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        with self._lock:
+            for path in list(self._iter_entries()):
+                path.unlink(missing_ok=True)
+            self._total_bytes = 0
@@ -1,3 +1,6 @@
 from .document_categorizer import DocumentCategorizer
+from .local_classifier import LocalClassifier
+from .rule_splitter import RuleSplitter
+from .schema_registry import SchemaRegistry, get_registry
 
-__all__ = ['DocumentCategorizer']
+__all__ = ['DocumentCategorizer', 'LocalClassifier', 'RuleSplitter', 'SchemaRegistry', 'get_registry']
@@ -1,31 +1,62 @@
 # document_processor/categorizer/document_categorizer.py
 from pathlib import Path
+import asyncio
+import contextvars
 import json
-from typing import List
-from openai import OpenAI
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from llm_client import LLMClient, count_tokens, get_default_client
+from ..concurrency import ConcurrencyLimits, StageLimiter
 from ..models.document import DocumentSection
+from .rule_splitter import RuleSplitter
+from .schema_registry import get_registry
+
+logger = logging.getLogger(__name__)
 
 class DocumentCategorizer:
     """Categorizes document sections based on content."""
     
-    def __init__(self, schema_dir: Path):
-        """Initialize with directory containing category schemas."""
-        self.client = OpenAI()
-        self.schemas = self._load_schemas(schema_dir)
-        self.categories = list(self.schemas.keys())
-        
-    def _load_schemas(self, schema_dir: Path) -> dict:
-        schemas = {}
-        for schema_file in schema_dir.glob("*.json"):
-            with open(schema_file) as f:
-                schemas[schema_file.stem] = json.load(f)
-        return schemas
+    # Bump when the categorization prompt changes so cached categories are invalidated
+    version: str = "1"
+    # Bump when section identification changes so cached section boundaries are invalidated
+    sections_version: str = "3"
     
-    def identify_sections(self, text: str) -> List[DocumentSection]:
-        """Identifies distinct document sections in text."""
-        # Split text into lines for line number tracking
-        lines = text.split('\n')
-        numbered_text = '\n'.join(f"{i+1}| {line}" for i, line in enumerate(lines))
+    def __init__(
+        self,
+        schema_dir: Path,
+        llm: Optional[LLMClient] = None,
+        window_tokens: int = 6000,
+        overlap_tokens: int = 400,
+        window_workers: int = 4,
+        split_threshold: Optional[float] = 0.75
+    ):
+        """
+        Initialize with directory containing category schemas.
+        
+        Args:
+            schema_dir: Directory containing category schemas
+            llm: Shared LLM client (default: the process-wide client)
+            window_tokens: Token budget of numbered text sent in one identify_sections request;
+                longer documents are split into overlapping windows
+            overlap_tokens: Tokens of text repeated between consecutive windows
+            window_workers: Maximum number of windows identified concurrently
+            split_threshold: Confidence at which the rule-based split is used without an
+                LLM call; None always asks the LLM
+        """
+        self.llm = llm or get_default_client()
+        self.window_tokens = window_tokens
+        self.overlap_tokens = overlap_tokens
+        self.window_workers = window_workers
+        self.split_threshold = split_threshold
+        self.splitter = RuleSplitter()
+        self.registry = get_registry(schema_dir)
+        self.schemas = self.registry.schemas
+        self.categories = self.registry.categories
+    
+    def _build_sections_request(self, lines: List[str], first_line: int = 1) -> dict:
+        """Build the identify_sections request kwargs for lines numbered from first_line."""
+        numbered_text = '\n'.join(f"{first_line + i}| {line}" for i, line in enumerate(lines))
         
         prompt = """
         Analyze the following text and identify distinct documents within it. Each line is numbered.
@@ -38,40 +69,43 @@ class DocumentCategorizer:
         """
         
         messages = [{
-            "role": "user", 
+            "role": "user",
             "content": prompt.format(text=numbered_text)
         }]
-        print("\nSending to OpenAI (identify_sections):")
-        print("Messages:", json.dumps(messages, indent=2))
+        logger.debug("Built identify_sections request for lines %d-%d", first_line, first_line + len(lines) - 1)
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            response_format={
+        return {
+            "model": "gpt-4",
+            "messages": messages,
+            "temperature": 0,
+            "response_format": {
                 "type": "json_schema",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "sections": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "start_line": {"type": "integer"},
-                                    "end_line": {"type": "integer"},
-                                    "description": {"type": "string"}
-                                },
-                                "required": ["start_line", "end_line", "description"]
+                "json_schema": {
+                    "name": "document_sections",
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "sections": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "start_line": {"type": "integer"},
+                                        "end_line": {"type": "integer"},
+                                        "description": {"type": "string"}
+                                    },
+                                    "required": ["start_line", "end_line", "description"]
+                                }
                             }
-                        }
-                    },
-                    "required": ["sections"]
+                        },
+                        "required": ["sections"]
+                    }
                 }
             }
-        )
-        print("\nOpenAI Response:")
-        print(json.dumps(response.model_dump(), indent=2))
-        
+        }
+    
+    def _parse_sections(self, response, text: str, lines: List[str]) -> List[DocumentSection]:
+        """Turn an identify_sections response into document sections."""
         try:
             result = json.loads(response.choices[0].message.content)
             if not isinstance(result, dict) or 'sections' not in result:
@@ -85,12 +119,164 @@ class DocumentCategorizer:
                 content='\n'.join(lines[section["start_line"]-1:section["end_line"]]),
                 start_line=section["start_line"],
                 end_line=section["end_line"]
-            ) 
+            )
             for section in result["sections"]
         ]
     
-    def categorize_section(self, section: DocumentSection) -> str:
-        """Determines the category of a document section."""
+    def _split_windows(self, lines: List[str]) -> List[Tuple[int, int]]:
+        """
+        Split lines into overlapping windows that each fit the token budget.
+        
+        Returns:
+            (start, end) line index ranges, end exclusive
+        """
+        line_tokens = [count_tokens(f"{i+1}| {line}\n") for i, line in enumerate(lines)]
+        windows = []
+        start = 0
+        while start < len(lines):
+            end = start
+            used = 0
+            # Always take at least one line so oversized lines still make progress
+            while end < len(lines) and (end == start or used + line_tokens[end] <= self.window_tokens):
+                used += line_tokens[end]
+                end += 1
+            windows.append((start, end))
+            if end >= len(lines):
+                break
+            
+            # Start the next window far enough back to repeat overlap_tokens of text
+            next_start = end
+            overlap = 0
+            while next_start > start + 1 and overlap + line_tokens[next_start - 1] <= self.overlap_tokens:
+                next_start -= 1
+                overlap += line_tokens[next_start]
+            start = next_start
+        return windows
+    
+    def _window_boundaries(self, response, start: int, end: int) -> List[dict]:
+        """Parse section starts from a window response, clamped to the window's 1-based lines."""
+        try:
+            result = json.loads(response.choices[0].message.content)
+            sections = result["sections"]
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning("Error parsing sections for lines %d-%d: %s", start + 1, end, e)
+            return []
+        
+        boundaries = []
+        for section in sections:
+            try:
+                start_line = int(section["start_line"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            boundaries.append({
+                "start_line": min(max(start_line, start + 1), end),
+                "description": section.get("description", "")
+            })
+        return boundaries
+    
+    def _merge_windows(
+        self,
+        lines: List[str],
+        windows: List[Tuple[int, int]],
+        boundaries: List[List[dict]]
+    ) -> List[DocumentSection]:
+        """
+        Merge per-window section starts into one contiguous global section list.
+        
+        Each overlap is split at its midpoint: a window only contributes starts that
+        fall in its own core, where it had context on both sides. Every section then
+        runs up to the line before the next start.
+        """
+        starts = {}
+        for i, ((start, end), window_boundaries) in enumerate(zip(windows, boundaries)):
+            core_start = start if i == 0 else (start + windows[i - 1][1]) // 2
+            core_end = end if i == len(windows) - 1 else (windows[i + 1][0] + end) // 2
+            for boundary in window_boundaries:
+                if core_start < boundary["start_line"] <= core_end:
+                    starts.setdefault(boundary["start_line"], boundary["description"])
+        starts.setdefault(1, "")
+        
+        ordered = sorted(starts)
+        sections = []
+        for i, start_line in enumerate(ordered):
+            end_line = ordered[i + 1] - 1 if i + 1 < len(ordered) else len(lines)
+            sections.append(DocumentSection(
+                content='\n'.join(lines[start_line - 1:end_line]),
+                start_line=start_line,
+                end_line=end_line
+            ))
+        return sections
+    
+    def _split_locally(self, text: str) -> Optional[List[DocumentSection]]:
+        """Return the rule-based split if it is confident enough to skip the LLM."""
+        if self.split_threshold is None:
+            return None
+        sections, confidence = self.splitter.split(text)
+        if confidence < self.split_threshold:
+            logger.info("Rule-based split not confident (%.2f), asking the LLM", confidence)
+            return None
+        logger.info("Rule-based split found %d sections (confidence %.2f)", len(sections), confidence)
+        return sections
+    
+    def identify_sections(self, text: str) -> List[DocumentSection]:
+        """Identifies distinct document sections in text."""
+        sections = self._split_locally(text)
+        if sections is not None:
+            return sections
+        
+        # Split text into lines for line number tracking
+        lines = text.split('\n')
+        windows = self._split_windows(lines)
+        if len(windows) == 1:
+            response = self.llm.create(stage='sections', **self._build_sections_request(lines))
+            return self._parse_sections(response, text, lines)
+        
+        logger.info("Identifying sections in %d windows", len(windows))
+        
+        def identify_window(window: Tuple[int, int]) -> List[dict]:
+            start, end = window
+            response = self.llm.create(stage='sections', **self._build_sections_request(lines[start:end], start + 1))
+            return self._window_boundaries(response, start, end)
+        
+        with ThreadPoolExecutor(max_workers=self.window_workers) as pool:
+            # Each window runs in a copy of the caller's context so its call keeps the metric tags
+            futures = [pool.submit(contextvars.copy_context().run, identify_window, window) for window in windows]
+            boundaries = [future.result() for future in futures]
+        return self._merge_windows(lines, windows, boundaries)
+    
+    async def identify_sections_async(self, text: str, limiter: Optional[StageLimiter] = None) -> List[DocumentSection]:
+        """
+        Async variant of identify_sections.
+        
+        Every LLM call, one per window, holds a 'sections' slot of the limiter,
+        so windows count against the shared stage and global limits. Without a
+        limiter, windows are bounded by window_workers alone.
+        """
+        sections = self._split_locally(text)
+        if sections is not None:
+            return sections
+        
+        limiter = limiter or StageLimiter(ConcurrencyLimits(sections=self.window_workers))
+        lines = text.split('\n')
+        windows = self._split_windows(lines)
+        if len(windows) == 1:
+            async with limiter.slot('sections'):
+                response = await self.llm.acreate(stage='sections', **self._build_sections_request(lines))
+            return self._parse_sections(response, text, lines)
+        
+        logger.info("Identifying sections in %d windows", len(windows))
+        
+        async def identify_window(window: Tuple[int, int]) -> List[dict]:
+            start, end = window
+            async with limiter.slot('sections'):
+                response = await self.llm.acreate(stage='sections', **self._build_sections_request(lines[start:end], start + 1))
+            return self._window_boundaries(response, start, end)
+        
+        boundaries = await asyncio.gather(*(identify_window(window) for window in windows))
+        return self._merge_windows(lines, windows, boundaries)
+    
+    def _build_category_request(self, section: DocumentSection) -> dict:
+        """Build the categorize_section request kwargs for a section."""
         prompt = f"""
         Analyze this document and determine which category it belongs to.
         
@@ -102,29 +288,31 @@ class DocumentCategorizer:
         """
         
         messages = [{"role": "user", "content": prompt}]
-        print("\nSending to OpenAI (categorize_section):")
-        print("Messages:", json.dumps(messages, indent=2))
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            response_format={
+        return {
+            "model": "gpt-4",
+            "messages": messages,
+            "temperature": 0,
+            "response_format": {
                 "type": "json_schema",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "category": {
-                            "type": "string",
-                            "enum": self.categories
-                        }
-                    },
-                    "required": ["category"]
+                "json_schema": {
+                    "name": "document_category",
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "category": {
+                                "type": "string",
+                                "enum": self.categories
+                            }
+                        },
+                        "required": ["category"]
+                    }
                 }
             }
-        )
-        print("\nOpenAI Response:")
-        print(json.dumps(response.model_dump(), indent=2))
-        
+        }
+    
+    def _parse_category(self, response, section: DocumentSection) -> str:
+        """Turn a categorize_section response into a category name."""
         try:
             result = json.loads(response.choices[0].message.content)
             category = result.get('category', '').strip().lower()
@@ -145,5 +333,15 @@ class DocumentCategorizer:
             return category
         except Exception as e:
             # Default to ownership_control if anything goes wrong
-            print(f"\nError parsing category: {e}")
+            logger.warning("Error parsing category: %s", e)
             return 'ownership_control'
+    
+    def categorize_section(self, section: DocumentSection) -> str:
+        """Determines the category of a document section."""
+        response = self.llm.create(stage='categorization', **self._build_category_request(section))
+        return self._parse_category(response, section)
+    
+    async def categorize_section_async(self, section: DocumentSection) -> str:
+        """Async variant of categorize_section."""
+        response = await self.llm.acreate(stage='categorization', **self._build_category_request(section))
+        return self._parse_category(response, section)
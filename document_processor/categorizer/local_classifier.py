@@ -0,0 +1,255 @@
+# document_processor/categorizer/local_classifier.py
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Keyword rules, extending the fallback that DocumentCategorizer applies to unparseable responses
+KEYWORD_RULES: Dict[str, List[str]] = {
+    'company_formation': [
+        'license', 'licence', 'certificate', 'registration', 'incorporation',
+        'memorandum of association', 'articles of association', 'trade name'
+    ],
+    'business_activities': [
+        'invoice', 'contract', 'agreement', 'purchase order', 'quotation', 'bill to'
+    ],
+    'compliance_checks': [
+        'compliance', 'sanction', 'verification', 'adverse media', 'politically exposed', 'world-check'
+    ],
+    'financial_documents': [
+        'financial', 'statement', 'balance', 'profit and loss', 'audited', 'opening balance'
+    ],
+    'ownership_control': [
+        'shareholder', 'share register', 'beneficial owner', 'ubo', 'shareholding', 'board of directors'
+    ]
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z\-]{1,}")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class ClassifierStats:
+    """
+    Counts how often the local classifier skips the LLM and how often it agrees with it.
+    
+    Audited comparisons are of predictions confident enough to skip the LLM,
+    so their agreement rate is the accuracy of the sections that are skipped.
+    """
+    
+    def __init__(self):
+        self.predictions = 0
+        self.skipped = 0
+        self.compared = 0
+        self.agreed = 0
+        self.audited = 0
+        self.audit_agreed = 0
+        self._lock = threading.Lock()
+    
+    def record_prediction(self, skipped: bool) -> None:
+        with self._lock:
+            self.predictions += 1
+            self.skipped += int(skipped)
+    
+    def record_comparison(self, agreed: bool, audited: bool = False) -> None:
+        with self._lock:
+            self.compared += 1
+            self.agreed += int(agreed)
+            if audited:
+                self.audited += 1
+                self.audit_agreed += int(agreed)
+    
+    def report(self) -> dict:
+        return {
+            "predictions": self.predictions,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.predictions if self.predictions else 0.0,
+            "compared": self.compared,
+            "agreement_rate": self.agreed / self.compared if self.compared else 0.0,
+            "audited": self.audited,
+            "audit_agreement_rate": self.audit_agreed / self.audited if self.audited else 0.0
+        }
+
+class LocalClassifier:
+    """
+    Cheap local section classifier that runs before the LLM.
+    
+    Combines keyword rules with a nearest-centroid linear model over TF-IDF
+    features trained from past LLM categorizations. Without training data it
+    falls back to the keyword rules alone, with correspondingly lower confidence.
+    
+    The model's softmax only ranks categories relative to each other, so it
+    is used only once every category has enough training examples, and only
+    for texts that are actually similar to the best centroid and clearly
+    closer to it than to the runner-up. Otherwise the rules decide alone.
+    """
+    
+    def __init__(
+        self,
+        categories: List[str],
+        rule_weight: float = 0.3,
+        temperature: float = 0.05,
+        rule_evidence: int = 5,
+        min_examples: int = 20,
+        min_similarity: float = 0.2,
+        min_margin: float = 0.05
+    ):
+        """
+        Initialize an untrained classifier.
+        
+        Args:
+            categories: Category names the classifier may return
+            rule_weight: Weight of the keyword rules when blended with the trained model
+            temperature: Softmax temperature applied to the model's cosine scores
+            rule_evidence: Keyword hits needed before rules alone reach full confidence
+            min_examples: Training examples every category needs before the model is used
+            min_similarity: Cosine similarity to the best centroid below which the model abstains
+            min_margin: Cosine gap between the best and second-best centroid below which
+                the model abstains
+        """
+        self.categories = categories
+        self.rule_weight = rule_weight
+        self.temperature = temperature
+        self.rule_evidence = rule_evidence
+        self.min_examples = min_examples
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.example_counts: Dict[str, int] = {}
+        self.stats = ClassifierStats()
+    
+    @property
+    def trained(self) -> bool:
+        """Whether every category has a centroid fitted on at least min_examples examples."""
+        return all(
+            category in self.centroids and self.example_counts.get(category, 0) >= self.min_examples
+            for category in self.categories
+        )
+    
+    def _vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        """L2-normalized TF-IDF vector over the training vocabulary."""
+        counts = Counter(token for token in tokens if token in self.idf)
+        vector = {token: (1 + math.log(count)) * self.idf[token] for token, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {token: value / norm for token, value in vector.items()} if norm else {}
+    
+    def train(self, examples: Iterable[Tuple[str, str]]) -> int:
+        """
+        Fit the TF-IDF model on (text, category) examples.
+        
+        Returns:
+            Number of examples used
+        """
+        documents = [(tokenize(text), category) for text, category in examples if category in self.categories]
+        if not documents:
+            return 0
+        
+        document_frequency = Counter()
+        for tokens, _ in documents:
+            document_frequency.update(set(tokens))
+        total = len(documents)
+        self.idf = {
+            token: math.log((1 + total) / (1 + frequency)) + 1
+            for token, frequency in document_frequency.items()
+        }
+        
+        sums: Dict[str, Counter] = {category: Counter() for category in self.categories}
+        for tokens, category in documents:
+            sums[category].update(self._vectorize(tokens))
+        self.example_counts = dict(Counter(category for _, category in documents))
+        
+        self.centroids = {}
+        for category, centroid in sums.items():
+            norm = math.sqrt(sum(value * value for value in centroid.values()))
+            if norm:
+                self.centroids[category] = {token: value / norm for token, value in centroid.items()}
+        return total
+    
+    def _rule_scores(self, text: str) -> Tuple[Dict[str, float], int]:
+        """Distribution over categories from keyword hits, and the total number of hits."""
+        lowered = text.lower()
+        hits = {
+            category: sum(lowered.count(keyword) for keyword in KEYWORD_RULES.get(category, []))
+            for category in self.categories
+        }
+        total = sum(hits.values())
+        if not total:
+            return {}, 0
+        return {category: count / total for category, count in hits.items()}, total
+    
+    def _model_scores(self, text: str) -> Dict[str, float]:
+        """
+        Softmax over cosine similarity to each category centroid, or nothing
+        when the best centroid is not similar enough or not clearly the best.
+        """
+        vector = self._vectorize(tokenize(text))
+        if not vector:
+            return {}
+        similarities = {
+            category: sum(weight * centroid.get(token, 0.0) for token, weight in vector.items())
+            for category, centroid in self.centroids.items()
+        }
+        ranked = sorted(similarities.values(), reverse=True)
+        top = ranked[0]
+        runner_up = ranked[1] if len(ranked) > 1 else 0.0
+        if top < self.min_similarity or top - runner_up < self.min_margin:
+            return {}
+        exps = {category: math.exp((score - top) / self.temperature) for category, score in similarities.items()}
+        total = sum(exps.values())
+        return {category: value / total for category, value in exps.items()}
+    
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Predict the category of a section.
+        
+        Returns:
+            (category, confidence in [0, 1]), or (None, 0.0) when there is no signal
+        """
+        rules, hits = self._rule_scores(text)
+        model = self._model_scores(text) if self.trained else {}
+        
+        if model and rules:
+            scores = {
+                category: (1 - self.rule_weight) * model.get(category, 0.0) + self.rule_weight * rules.get(category, 0.0)
+                for category in self.categories
+            }
+        elif model:
+            scores = model
+        elif rules:
+            # Rules alone are never fully trusted, and a single stray keyword counts for little
+            evidence = min(1.0, hits / self.rule_evidence)
+            scores = {category: 0.9 * evidence * score for category, score in rules.items()}
+        else:
+            return None, 0.0
+        
+        category = max(scores, key=scores.get)
+        return category, scores[category]
+    
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                "categories": self.categories,
+                "idf": self.idf,
+                "centroids": self.centroids,
+                "example_counts": self.example_counts
+            }, f)
+    
+    @classmethod
+    def load(cls, path: Path, categories: List[str]) -> 'LocalClassifier':
+        """Load a saved model, or return an untrained (rules-only) classifier if there is none."""
+        classifier = cls(categories)
+        if path.exists():
+            with open(path) as f:
+                data = json.load(f)
+            # A model trained on a different category set would predict stale names
+            if sorted(data.get("categories", [])) == sorted(categories):
+                classifier.idf = data["idf"]
+                classifier.centroids = data["centroids"]
+                # Models saved without counts are treated as untrained until retrained
+                classifier.example_counts = data.get("example_counts", {})
+        return classifier
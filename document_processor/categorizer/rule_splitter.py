@@ -0,0 +1,169 @@
+# document_processor/categorizer/rule_splitter.py
+import re
+from collections import Counter
+from typing import List, Optional, Set, Tuple
+from ..models.document import DocumentSection, PAGE_BREAK
+
+# Words that mark an all-caps line as a document title rather than a letterhead
+TITLE_KEYWORDS = {
+    'certificate', 'incorporation', 'memorandum', 'articles', 'license', 'licence',
+    'agreement', 'contract', 'invoice', 'statement', 'register', 'resolution',
+    'declaration', 'attorney', 'passport', 'report', 'minutes', 'deed', 'receipt'
+}
+
+PAGE_NUMBER_PATTERNS = [
+    re.compile(r"\bpage\s+(\d+)\s*(?:of|/)\s*\d+\b", re.IGNORECASE),
+    re.compile(r"^\s*(?:page\s+)?-?\s*(\d{1,3})\s*-?\s*$", re.IGNORECASE)
+]
+
+# Boundary decisions
+NEW_DOCUMENT = "new"
+CONTINUATION = "continue"
+
+class RuleSplitter:
+    """
+    Deterministic splitter for document bundles with obvious boundaries.
+    
+    Pages (separated by PAGE_BREAK lines) are the unit of splitting. Every page
+    boundary is decided from title headings at the top of a page, page numbering,
+    and running header/footer fingerprints shared between pages. The confidence of
+    a split is that of its least certain decision, so a single ambiguous boundary
+    is enough to hand the whole text to the LLM instead.
+    """
+    
+    def __init__(self, zone_lines: int = 3, no_evidence_score: float = 0.3):
+        """
+        Initialize the splitter.
+        
+        Args:
+            zone_lines: Non-empty lines at the top and bottom of a page searched for
+                headers, footers, page numbers and titles
+            no_evidence_score: Confidence of a boundary with no evidence either way
+        """
+        self.zone_lines = zone_lines
+        self.no_evidence_score = no_evidence_score
+    
+    def is_title(self, line: str) -> bool:
+        """Whether a line looks like a document title, e.g. CERTIFICATE OF INCORPORATION."""
+        stripped = line.strip()
+        words = stripped.split()
+        if not 1 <= len(words) <= 10 or len(stripped) > 80:
+            return False
+        letters = sum(char.isalpha() for char in stripped)
+        if letters < 0.6 * len(stripped.replace(' ', '')) or stripped.upper() != stripped:
+            return False
+        return any(word.strip('.,:;()-').lower() in TITLE_KEYWORDS for word in words)
+    
+    def _fingerprint(self, line: str) -> str:
+        """Normalize a line so repeated headers match despite changing numbers and dates."""
+        return re.sub(r"\s+", " ", re.sub(r"\d+", "#", line.strip().lower()))
+    
+    def _pages(self, lines: List[str]) -> List[Tuple[int, int]]:
+        """Return (start, end) 0-based line ranges of each page, excluding break lines."""
+        pages = []
+        start = 0
+        for i, line in enumerate(lines):
+            if line == PAGE_BREAK:
+                pages.append((start, i))
+                start = i + 1
+        pages.append((start, len(lines)))
+        return pages
+    
+    def _zones(self, lines: List[str], page: Tuple[int, int]) -> Tuple[List[str], List[str]]:
+        """The first and last few non-empty lines of a page."""
+        content = [line for line in lines[page[0]:page[1]] if line.strip()]
+        return content[:self.zone_lines], content[-self.zone_lines:]
+    
+    def _page_number(self, zone: List[str]) -> Optional[int]:
+        for line in zone:
+            for pattern in PAGE_NUMBER_PATTERNS:
+                match = pattern.search(line)
+                if match:
+                    return int(match.group(1))
+        return None
+    
+    def _decide(self, evidence: List[Tuple[str, float]]) -> Tuple[str, float]:
+        """Combine (decision, weight) evidence for one boundary into a decision and its confidence."""
+        if not evidence:
+            return CONTINUATION, self.no_evidence_score
+        decisions = {decision for decision, _ in evidence}
+        if len(decisions) > 1:
+            # Conflicting signals: guess, but never confidently
+            new_weight = sum(weight for decision, weight in evidence if decision == NEW_DOCUMENT)
+            continue_weight = sum(weight for decision, weight in evidence if decision == CONTINUATION)
+            return (NEW_DOCUMENT if new_weight > continue_weight else CONTINUATION), self.no_evidence_score
+        
+        # Agreeing signals reinforce each other
+        doubt = 1.0
+        for _, weight in evidence:
+            doubt *= 1 - weight
+        return decisions.pop(), 1 - doubt
+    
+    def split(self, text: str) -> Tuple[List[DocumentSection], float]:
+        """
+        Split text into document sections.
+        
+        Returns:
+            (sections, confidence in [0, 1]); sections carry 1-based line ranges
+        """
+        lines = text.split('\n')
+        pages = self._pages(lines)
+        
+        tops: List[List[str]] = []
+        bottoms: List[List[str]] = []
+        for page in pages:
+            top, bottom = self._zones(lines, page)
+            tops.append(top)
+            bottoms.append(bottom)
+        
+        titled = [any(self.is_title(line) for line in top) for top in tops]
+        numbers = [self._page_number(bottom) or self._page_number(top) for top, bottom in zip(tops, bottoms)]
+        
+        # Running headers/footers are non-title zone lines repeated on several pages
+        page_fingerprints: List[Set[str]] = [
+            {self._fingerprint(line) for line in top + bottom if not self.is_title(line)}
+            for top, bottom in zip(tops, bottoms)
+        ]
+        counts = Counter(fingerprint for fingerprints in page_fingerprints for fingerprint in fingerprints)
+        running = [{fingerprint for fingerprint in fingerprints if counts[fingerprint] > 1} for fingerprints in page_fingerprints]
+        
+        # A title further down a page may start another document mid-page, which rules cannot place
+        scores = []
+        for page, top in zip(pages, tops):
+            body = [line for line in lines[page[0]:page[1]] if line.strip()][len(top):]
+            if any(self.is_title(line) for line in body):
+                scores.append(self.no_evidence_score)
+        
+        starts = [0]
+        if len(pages) == 1:
+            scores.append(0.85 if titled[0] else 0.5)
+        for i in range(1, len(pages)):
+            evidence: List[Tuple[str, float]] = []
+            if titled[i]:
+                evidence.append((NEW_DOCUMENT, 0.85))
+            if numbers[i] == 1:
+                evidence.append((NEW_DOCUMENT, 0.9))
+            elif numbers[i] is not None and numbers[i - 1] is not None and numbers[i] == numbers[i - 1] + 1:
+                evidence.append((CONTINUATION, 0.9))
+            # Documents from one issuer share a letterhead, so running headers only
+            # decide boundaries that titles and page numbers leave open
+            if not evidence and running[i] & running[i - 1]:
+                evidence.append((CONTINUATION, 0.8))
+            elif not evidence and running[i] and running[i - 1]:
+                evidence.append((NEW_DOCUMENT, 0.7))
+            
+            decision, score = self._decide(evidence)
+            scores.append(score)
+            if decision == NEW_DOCUMENT:
+                starts.append(i)
+        
+        sections = []
+        for i, first_page in enumerate(starts):
+            last_page = starts[i + 1] - 1 if i + 1 < len(starts) else len(pages) - 1
+            start, end = pages[first_page][0], pages[last_page][1]
+            sections.append(DocumentSection(
+                content='\n'.join(lines[start:end]),
+                start_line=start + 1,
+                end_line=end
+            ))
+        return sections, min(scores)
@@ -0,0 +1,232 @@
+# document_processor/categorizer/schema_registry.py
+import json
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+from ..cache import hash_text
+
+# A compiled validator appends (path, message) pairs for every violation under a path
+Validator = Callable[[Any, str, List[Tuple[str, str]]], None]
+
+# Message of a required field the model set to null, i.e. the document does not state it
+NULL_REQUIRED = "required field is null"
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _is_date(value: str) -> bool:
+    try:
+        date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def _is_datetime(value: str) -> bool:
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return True
+    except ValueError:
+        return False
+
+FORMAT_CHECKS: Dict[str, Callable[[str], bool]] = {
+    'date': _is_date,
+    'date-time': _is_datetime,
+    'email': lambda value: bool(EMAIL_PATTERN.match(value))
+}
+
+TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    # bool is an int subclass in Python but not a JSON number
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None
+}
+
+def child_path(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile a JSON schema into a validator closure.
+    
+    Supports the subset used by the category schemas: type, properties,
+    required, items, enum, format and minimum/maximum. All keyword lookups
+    happen once here, so validating a summary is just a walk over the data.
+    """
+    checks: List[Validator] = []
+    
+    types = schema.get('type')
+    if types is not None:
+        type_names = types if isinstance(types, list) else [types]
+        type_checks = [TYPE_CHECKS[name] for name in type_names if name in TYPE_CHECKS]
+        expected = ' or '.join(type_names)
+        
+        def check_type(value, path, errors):
+            if not any(check(value) for check in type_checks):
+                errors.append((path, f"expected {expected}, got {type(value).__name__}"))
+        checks.append(check_type)
+    
+    if 'enum' in schema:
+        allowed = schema['enum']
+        
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                errors.append((path, f"must be one of {allowed}"))
+        checks.append(check_enum)
+    
+    if 'format' in schema and schema['format'] in FORMAT_CHECKS:
+        format_name = schema['format']
+        format_check = FORMAT_CHECKS[format_name]
+        
+        def check_format(value, path, errors):
+            if isinstance(value, str) and not format_check(value):
+                errors.append((path, f"not a valid {format_name}"))
+        checks.append(check_format)
+    
+    minimum, maximum = schema.get('minimum'), schema.get('maximum')
+    if minimum is not None or maximum is not None:
+        def check_range(value, path, errors):
+            if not TYPE_CHECKS['number'](value):
+                return
+            if minimum is not None and value < minimum:
+                errors.append((path, f"must be >= {minimum}"))
+            if maximum is not None and value > maximum:
+                errors.append((path, f"must be <= {maximum}"))
+        checks.append(check_range)
+    
+    if 'properties' in schema or 'required' in schema:
+        properties = {name: compile_schema(sub) for name, sub in schema.get('properties', {}).items()}
+        required = set(schema.get('required', []))
+        
+        def check_properties(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append((child_path(path, name), "required field is missing"))
+                elif value[name] is None:
+                    errors.append((child_path(path, name), NULL_REQUIRED))
+            for name, validator in properties.items():
+                # Models return null for facts a document does not state; for optional
+                # fields that means "absent", not a violation worth a repair call
+                if value.get(name) is not None:
+                    validator(value[name], child_path(path, name), errors)
+        checks.append(check_properties)
+    
+    if 'items' in schema:
+        item_validator = compile_schema(schema['items'])
+        
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    item_validator(item, f"{path}[{i}]", errors)
+        checks.append(check_items)
+    
+    def validate(value, path, errors):
+        for check in checks:
+            check(value, path, errors)
+    return validate
+
+PATH_TOKEN = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+
+def parse_path(path: str) -> List[Any]:
+    """Split a validator path like "directors[0].name" into keys and indexes."""
+    return [int(index) if index else key for key, index in PATH_TOKEN.findall(path)]
+
+def get_path(data: Any, path: str) -> Any:
+    """Return the value at a validator path, or None if it does not exist."""
+    for part in parse_path(path):
+        if isinstance(part, int) and isinstance(data, list) and part < len(data):
+            data = data[part]
+        elif isinstance(part, str) and isinstance(data, dict):
+            data = data.get(part)
+        else:
+            return None
+    return data
+
+def set_path(data: Any, path: str, value: Any) -> bool:
+    """Set the value at a validator path in place; returns False if the path does not exist."""
+    parts = parse_path(path)
+    target = data
+    for part in parts[:-1]:
+        if isinstance(part, int):
+            if not isinstance(target, list) or part >= len(target):
+                return False
+            target = target[part]
+        else:
+            if not isinstance(target, dict):
+                return False
+            if target.get(part) is None:
+                target[part] = {}
+            target = target[part]
+    last = parts[-1] if parts else None
+    if isinstance(last, int) and isinstance(target, list) and last < len(target):
+        target[last] = value
+        return True
+    if isinstance(last, str) and isinstance(target, dict):
+        target[last] = value
+        return True
+    return False
+
+class SchemaRegistry:
+    """
+    Category schemas loaded once and shared by the categorizer and summarizer.
+    
+    Each schema is kept with its content-hash version, a compact string for
+    prompts and a precompiled validator.
+    """
+    
+    def __init__(self, schema_dir: Path):
+        self.schema_dir = schema_dir
+        self.schemas: Dict[str, Dict[str, Any]] = {}
+        for schema_file in sorted(schema_dir.glob("*.json")):
+            with open(schema_file) as f:
+                self.schemas[schema_file.stem] = json.load(f)
+        
+        # Content hash per schema, so editing one schema only invalidates its own results
+        self.versions = {
+            name: hash_text(json.dumps(schema, sort_keys=True))
+            for name, schema in self.schemas.items()
+        }
+        # Prompt-ready schemas without metadata keys or indentation
+        self.prompt_schemas = {
+            name: {key: value for key, value in schema.items() if key not in ('$schema', 'title')}
+            for name, schema in self.schemas.items()
+        }
+        self.prompt_strings = {
+            name: json.dumps(schema, separators=(',', ':'))
+            for name, schema in self.prompt_schemas.items()
+        }
+        self.validators = {name: compile_schema(schema) for name, schema in self.schemas.items()}
+    
+    @property
+    def categories(self) -> List[str]:
+        return list(self.schemas.keys())
+    
+    def validate(self, category: str, data: Any) -> List[Tuple[str, str]]:
+        """Return (path, message) for every schema violation in data; empty when valid."""
+        errors: List[Tuple[str, str]] = []
+        self.validators[category](data, "", errors)
+        return errors
+    
+    def field_schema(self, category: str, path: str) -> Dict[str, Any]:
+        """Return the sub-schema that applies at a validator path."""
+        schema = self.schemas[category]
+        for part in parse_path(path):
+            if isinstance(part, int):
+                schema = schema.get('items', {})
+            else:
+                schema = schema.get('properties', {}).get(part, {})
+        return schema
+
+@lru_cache(maxsize=None)
+def _registry_for(schema_dir: Path) -> SchemaRegistry:
+    return SchemaRegistry(schema_dir)
+
+def get_registry(schema_dir: Path) -> SchemaRegistry:
+    """Return the process-wide registry for a schema directory, loading it on first use."""
+    return _registry_for(schema_dir.resolve())
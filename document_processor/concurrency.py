@@ -0,0 +1,51 @@
+# document_processor/concurrency.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+from llm_client.metrics import queue_wait
+
+@dataclass
+class ConcurrencyLimits:
+    """Upper bounds on concurrent work in the async processing pipeline."""
+    global_limit: int = 16  # Total in-flight work across all stages
+    files: int = 8  # Files processed at the same time
+    extraction: int = 4  # Text extraction (pdfplumber/OCR) runs in worker threads
+    sections: int = 4  # identify_sections calls
+    categorization: int = 8  # categorize_section calls
+    summarization: int = 8  # summarize_section calls
+    report: int = 4  # Report sections generated at the same time
+
+class StageLimiter:
+    """Hands out concurrency slots per pipeline stage, bounded by a shared global limit."""
+    
+    def __init__(self, limits: Optional[ConcurrencyLimits] = None):
+        self.limits = limits or ConcurrencyLimits()
+        self._global = asyncio.Semaphore(self.limits.global_limit)
+        self._stages: Dict[str, asyncio.Semaphore] = {}
+    
+    def _stage_semaphore(self, stage: str) -> asyncio.Semaphore:
+        if stage not in self._stages:
+            limit = getattr(self.limits, stage, None)
+            if not isinstance(limit, int) or stage == 'global_limit':
+                raise ValueError(f"Unknown pipeline stage: {stage}")
+            self._stages[stage] = asyncio.Semaphore(limit)
+        return self._stages[stage]
+    
+    @asynccontextmanager
+    async def slot(self, stage: str) -> AsyncIterator[None]:
+        """Hold one slot of the given stage and of the global limit."""
+        requested = time.monotonic()
+        # Acquire the stage slot first so a saturated stage never hoards global slots
+        async with self._stage_semaphore(stage):
+            async with self._global:
+                # LLM calls made while holding the slot report how long it took to get
+                with queue_wait(time.monotonic() - requested):
+                    yield
+    
+    @asynccontextmanager
+    async def file_slot(self) -> AsyncIterator[None]:
+        """Hold one of the per-file slots; not counted against the global limit."""
+        async with self._stage_semaphore('files'):
+            yield
@@ -1,17 +1,117 @@
 import json
+import logging
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
 from .models.company import Company
 from .models.person import Person
 from .models.share import CompanyShare, PersonShare, create_share
 from .models.company_relation import CompanyRelation
+from .transactions import TransactionTable
+
+logger = logging.getLogger(__name__)
+
+# Mongo extended JSON numeric wrappers and the types they decode to
+EXTENDED_NUMBERS: Dict[str, Callable[[str], Any]] = {
+    '$numberInt': int,
+    '$numberLong': int,
+    '$numberDouble': float,
+    '$numberDecimal': float
+}
+
+def decode_extended_json(obj: dict) -> Any:
+    """json object_hook unwrapping Mongo extended JSON numbers; $oid and $date wrappers are kept."""
+    if len(obj) == 1:
+        key, value = next(iter(obj.items()))
+        if key in EXTENDED_NUMBERS:
+            try:
+                return EXTENDED_NUMBERS[key](value)
+            except (TypeError, ValueError):
+                return obj
+    return obj
+
+def object_id(value: Any) -> Optional[str]:
+    """Normalize a plain or {"$oid": ...} id to a string."""
+    if isinstance(value, dict):
+        value = value.get('$oid')
+    return str(value) if value else None
+
+def iter_json_records(
+    file_path: Path,
+    predicate: Optional[Callable[[dict], bool]] = None,
+    chunk_size: int = 1024 * 1024
+) -> Iterator[dict]:
+    """
+    Stream the records of a JSON array or JSON Lines file without loading it whole.
+    
+    The file is read in chunks and each element is decoded as soon as it is
+    complete, so memory holds one chunk plus the records the caller keeps.
+    
+    Args:
+        file_path: A JSON array export or a JSONL file
+        predicate: Records for which this returns False are dropped right after decoding
+        chunk_size: Characters read from the file at a time
+    """
+    decoder = json.JSONDecoder(object_hook=decode_extended_json)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        position = 0
+        in_array = None
+        
+        while True:
+            # Skip whitespace and array separators between records
+            while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ',')):
+                position += 1
+            if position >= len(buffer):
+                buffer = f.read(chunk_size)
+                position = 0
+                if not buffer:
+                    return
+                continue
+            
+            if in_array is None:
+                # An export is either one top-level array or one record per line
+                in_array = buffer[position] == '['
+                if in_array:
+                    position += 1
+                continue
+            if in_array and buffer[position] == ']':
+                return
+            
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The record is cut off at the end of the buffer: read on and retry
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            
+            position = end
+            if predicate is None or predicate(record):
+                yield record
+            
+            # Drop consumed text so the buffer never grows beyond the current record
+            if position > chunk_size:
+                buffer = buffer[position:]
+                position = 0
 
 class DataLoader:
     """Handles loading and processing of structured data files."""
     
-    def __init__(self, data_dir: Path):
-        """Initialize with directory containing data files."""
+    def __init__(self, data_dir: Path, company_ids: Optional[Iterable[str]] = None):
+        """
+        Initialize with directory containing data files.
+        
+        Args:
+            data_dir: Directory containing the backoffice exports
+            company_ids: Companies in scope for the current case; persons, shares and
+                transactions of other companies are dropped while parsing (default: all)
+        """
         self.data_dir = data_dir
+        self.company_ids: Optional[Set[str]] = set(company_ids) if company_ids is not None else None
         self.companies: Dict[str, Company] = {}
         self.persons: Dict[str, Person] = {}
         self.company_shares: List[CompanyShare] = []
@@ -19,53 +119,110 @@ class DataLoader:
         self.transactions: List[dict] = []
         self.company_relations: List[CompanyRelation] = []
         
-    def _load_json(self, filename: str) -> List[dict]:
-        """Load and parse a JSON file."""
+        self.loaded = False
+        
+        # Secondary indexes, kept in step with the lists above by the add_* methods
+        self._persons_by_company: Dict[str, List[Person]] = defaultdict(list)
+        self._shares_by_company: Dict[str, List[Union[CompanyShare, PersonShare]]] = defaultdict(list)
+        self._shares_by_owner: Dict[str, List[Union[CompanyShare, PersonShare]]] = defaultdict(list)
+        self._transactions_by_company: Dict[str, List[dict]] = defaultdict(list)
+        self._relations_by_parent: Dict[str, List[CompanyRelation]] = defaultdict(list)
+        self._relations_by_child: Dict[str, List[CompanyRelation]] = defaultdict(list)
+        # Bumped whenever shares change, so derived results (e.g. ownership chains) can be invalidated
+        self.revision = 0
+        
+    def _in_scope(self, data: dict) -> bool:
+        """Whether a record belongs to a company in scope; records naming no company are kept."""
+        company_id = object_id(data.get('companyId'))
+        return self.company_ids is None or company_id is None or company_id in self.company_ids
+        
+    def _iter_json(self, filename: str, scoped: bool = False) -> Iterator[dict]:
+        """Stream the records of an export (.json array or .jsonl), optionally only those in scope."""
         file_path = self.data_dir / filename
         if not file_path.exists():
-            return []
-        with open(file_path, 'r') as f:
-            return json.load(f)
+            file_path = file_path.with_suffix('.jsonl')
+            if not file_path.exists():
+                return iter(())
+        return iter_json_records(file_path, self._in_scope if scoped and self.company_ids is not None else None)
             
+    def add_company(self, company: Company) -> None:
+        self.companies[company.id] = company
+        
+    def add_person(self, person: Person) -> None:
+        """Add a person and index them by company."""
+        self.persons[person.id] = person
+        if person.company_id:
+            self._persons_by_company[person.company_id].append(person)
+        
+    def add_share(self, share: Union[CompanyShare, PersonShare]) -> None:
+        """Add a share and index it by company and by owner."""
+        if isinstance(share, CompanyShare):
+            self.company_shares.append(share)
+        else:
+            self.person_shares.append(share)
+        self._shares_by_company[object_id(share.company_id) or ''].append(share)
+        if share.owner is not None:
+            self._shares_by_owner[share.owner.id].append(share)
+        self.revision += 1
+        
+    def add_transaction(self, transaction: dict) -> None:
+        """Add a transaction record and index it by company."""
+        self.transactions.append(transaction)
+        company_id = object_id(transaction.get('companyId'))
+        if company_id:
+            self._transactions_by_company[company_id].append(transaction)
+        
+    def add_relation(self, relation: CompanyRelation) -> None:
+        """Add a company relation and index it by parent and by child."""
+        self.company_relations.append(relation)
+        self._relations_by_parent[relation.parent_company.id].append(relation)
+        self._relations_by_child[relation.child_company.id].append(relation)
+        
     def load_all(self) -> None:
         """Load all data files and process them."""
         # Load companies first
-        company_data = self._load_json('backoffice_prod.companies.json')
-        for data in company_data:
-            company = Company.from_json(data)
-            self.companies[company.id] = company
+        for data in self._iter_json('backoffice_prod.companies.json'):
+            self.add_company(Company.from_json(data))
             
         # Load persons
-        person_data = self._load_json('backoffice_prod.companyPersons.json')
-        for data in person_data:
-            person = Person.from_json(data)
-            self.persons[person.id] = person
+        for data in self._iter_json('backoffice_prod.companyPersons.json', scoped=True):
+            self.add_person(Person.from_json(data))
             
         # Load company shares
-        company_share_data = self._load_json('backoffice_prod.companyShares.json')
-        for data in company_share_data:
-            owner_id = data.get('ownerId')
+        for data in self._iter_json('backoffice_prod.companyShares.json', scoped=True):
+            owner_id = object_id(data.get('ownerId'))
             if owner_id and owner_id in self.companies:
-                share = create_share(data, self.companies[owner_id])
-                self.company_shares.append(share)
+                self.add_share(create_share(data, self.companies[owner_id]))
                 
         # Load person shares
-        person_share_data = self._load_json('backoffice_prod.companyPersonShares.json')
-        for data in person_share_data:
-            owner_id = data.get('ownerId')
+        for data in self._iter_json('backoffice_prod.companyPersonShares.json', scoped=True):
+            owner_id = object_id(data.get('ownerId'))
             if owner_id and owner_id in self.persons:
-                share = create_share(data, self.persons[owner_id])
-                self.person_shares.append(share)
+                self.add_share(create_share(data, self.persons[owner_id]))
                 
         # Load transactions
-        self.transactions = self._load_json('backoffice_prod.companyTransactions.json')
+        for data in self._iter_json('backoffice_prod.companyTransactions.json', scoped=True):
+            self.add_transaction(data)
         
         # Load company relations
-        relation_data = self._load_json('backoffice_prod.companyRelations.json')
-        for data in relation_data:
+        for data in self._iter_json('backoffice_prod.companyRelations.json'):
+            # Companies are keyed by plain ids, so {"$oid": ...} ids are normalized before the lookup
+            data = {
+                **data,
+                '_id': object_id(data.get('_id')) or '',
+                'parentCompanyId': object_id(data.get('parentCompanyId')),
+                'childCompanyId': object_id(data.get('childCompanyId'))
+            }
             relation = CompanyRelation.from_json(data, self.companies)
             if relation:
-                self.company_relations.append(relation)
+                self.add_relation(relation)
+        
+        logger.info(
+            "Loaded %d companies, %d persons, %d shares and %d transactions",
+            len(self.companies), len(self.persons),
+            len(self.company_shares) + len(self.person_shares), len(self.transactions)
+        )
+        self.loaded = True
         
     def get_company_by_id(self, company_id: str) -> Optional[Company]:
         """Get a company by its ID."""
@@ -75,29 +232,36 @@ class DataLoader:
         """Get a person by their ID."""
         return self.persons.get(person_id)
         
+    def get_persons_for_company(self, company_id: str) -> List[Person]:
+        """Get the persons (directors, shareholders, ...) recorded for a company."""
+        return list(self._persons_by_company.get(company_id, []))
+        
     def get_shares_for_company(self, company_id: str) -> List[Union[CompanyShare, PersonShare]]:
         """Get all shares (both company and person) for a given company."""
+        shares = self._shares_by_company.get(company_id, [])
+        # Company-owned shares first, as before
         return [
-            *[share for share in self.company_shares if share.company_id == company_id],
-            *[share for share in self.person_shares if share.company_id == company_id]
+            *[share for share in shares if isinstance(share, CompanyShare)],
+            *[share for share in shares if isinstance(share, PersonShare)]
         ]
         
+    def get_shares_owned_by(self, owner_id: str) -> List[Union[CompanyShare, PersonShare]]:
+        """Get all shares held by a company or person."""
+        return list(self._shares_by_owner.get(owner_id, []))
+        
     def get_transactions_for_company(self, company_id: str) -> List[dict]:
         """Get all transactions for a given company."""
-        return [
-            transaction for transaction in self.transactions 
-            if transaction.get('companyId') == company_id
-        ]
+        return list(self._transactions_by_company.get(company_id, []))
+        
+    def get_transaction_table(self, company_id: Optional[str] = None) -> TransactionTable:
+        """Get the transactions of a company (default: all loaded) as a columnar table."""
+        return TransactionTable.from_records(
+            self.transactions if company_id is None else self._transactions_by_company.get(company_id, [])
+        )
         
     def get_company_relations(self, company_id: str) -> Dict[str, List[CompanyRelation]]:
         """Get all parent and child relations for a given company."""
         return {
-            'parent_relations': [
-                relation for relation in self.company_relations 
-                if relation.child_company.id == company_id
-            ],
-            'child_relations': [
-                relation for relation in self.company_relations 
-                if relation.parent_company.id == company_id
-            ]
+            'parent_relations': list(self._relations_by_child.get(company_id, [])),
+            'child_relations': list(self._relations_by_parent.get(company_id, []))
         }
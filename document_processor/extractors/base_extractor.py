@@ -5,6 +5,10 @@ from pathlib import Path
 class BaseExtractor(ABC):
     """Base class for all document extractors."""
     
+    # Bump whenever a change to an extractor alters the text it produces,
+    # so cached extraction results are invalidated.
+    version: str = "1"
+    
     @abstractmethod
     def can_handle(self, file_path: Path) -> bool:
         """Determines if this extractor can handle the given file type."""
@@ -1,13 +1,17 @@
 # document_processor/extractors/image_extractor.py
 from pathlib import Path
+from typing import Optional
+from llm_client import LLMClient
 from .base_extractor import BaseExtractor
 from .ocr_extractor import OCRExtractor
 
 class ImageExtractor(BaseExtractor):
     """Handles image files using OCR."""
     
-    def __init__(self, api_key: str):
-        self.ocr_extractor = OCRExtractor(api_key)
+    version = "2"
+    
+    def __init__(self, api_key: str, llm: Optional[LLMClient] = None):
+        self.ocr_extractor = OCRExtractor(api_key, llm)
     
     def can_handle(self, file_path: Path) -> bool:
         return file_path.suffix.lower() in ['.jpg', '.jpeg', '.png']
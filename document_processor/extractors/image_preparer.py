@@ -0,0 +1,171 @@
+# document_processor/extractors/image_preparer.py
+import io
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+from PIL import Image, ImageChops
+
+MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'GIF': 'image/gif'
+}
+
+@dataclass
+class PreparedImage:
+    """An image re-encoded for upload, with the size it replaced."""
+    name: str
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    raw_bytes: int  # Uncompressed pixel size of the input
+    original_bytes: Optional[int] = None  # Encoded input size; None for in-memory images
+    
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes saved against the encoded input; 0 for in-memory images, which have none."""
+        return self.original_bytes - len(self.data) if self.original_bytes is not None else 0
+
+class ImagePreparer:
+    """
+    Shrinks images before they are sent to the Vision model.
+    
+    Images are downscaled to a target DPI and maximum long edge, converted to
+    grayscale when they carry (almost) no colour, and re-encoded to whichever
+    of PNG or JPEG is smaller. The original encoding is kept when it is already
+    the smallest.
+    """
+    
+    def __init__(
+        self,
+        target_dpi: int = 150,
+        max_long_edge: int = 2048,
+        jpeg_quality: int = 85,
+        color_tolerance: int = 12,
+        max_color_fraction: float = 0.002
+    ):
+        """
+        Initialize the preparer.
+        
+        Args:
+            target_dpi: Resolution images are normalized down to when their DPI is known
+            max_long_edge: Maximum size in pixels of the longest image side
+            jpeg_quality: Quality used when re-encoding as JPEG
+            color_tolerance: Channel difference below which a pixel counts as gray
+            max_color_fraction: Fraction of coloured pixels still treated as grayscale
+        """
+        self.target_dpi = target_dpi
+        self.max_long_edge = max_long_edge
+        self.jpeg_quality = jpeg_quality
+        self.color_tolerance = color_tolerance
+        self.max_color_fraction = max_color_fraction
+        # Running totals: savings against encoded inputs, and the raw pixel size of
+        # in-memory images (e.g. rendered pages) against what they were uploaded as
+        self.total_bytes_saved = 0
+        self.rendered_raw_bytes = 0
+        self.rendered_upload_bytes = 0
+        self._lock = threading.Lock()
+    
+    def _is_grayscale(self, image: Image.Image) -> bool:
+        """Check whether converting an RGB image to grayscale loses meaningful colour."""
+        red, green, blue = image.split()
+        spread = ImageChops.lighter(
+            ImageChops.difference(red, green),
+            ImageChops.difference(green, blue)
+        )
+        histogram = spread.histogram()
+        colored = sum(histogram[self.color_tolerance + 1:])
+        return colored <= self.max_color_fraction * image.width * image.height
+    
+    def _normalize_mode(self, image: Image.Image) -> Image.Image:
+        """Flatten transparency and palettes so the image is L or RGB."""
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        if image.mode == 'RGB' and self._is_grayscale(image):
+            image = image.convert('L')
+        return image
+    
+    def _resize(self, image: Image.Image, source_dpi: Optional[float]) -> Image.Image:
+        """Downscale to the target DPI and maximum long edge; never upscales."""
+        scale = 1.0
+        if source_dpi and source_dpi > self.target_dpi:
+            scale = self.target_dpi / source_dpi
+        long_edge = max(image.size) * scale
+        if long_edge > self.max_long_edge:
+            scale *= self.max_long_edge / long_edge
+        if scale >= 1.0:
+            return image
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.LANCZOS)
+    
+    def _encode(self, image: Image.Image) -> List[tuple]:
+        """Encode an image in every candidate format, returning (bytes, mime type) pairs."""
+        candidates = []
+        png = io.BytesIO()
+        image.save(png, format='PNG', optimize=True)
+        candidates.append((png.getvalue(), MIME_TYPES['PNG']))
+        jpeg = io.BytesIO()
+        image.save(jpeg, format='JPEG', quality=self.jpeg_quality, optimize=True)
+        candidates.append((jpeg.getvalue(), MIME_TYPES['JPEG']))
+        return candidates
+    
+    def prepare(
+        self,
+        image: Image.Image,
+        name: str,
+        source_dpi: Optional[float] = None,
+        original: Optional[bytes] = None
+    ) -> PreparedImage:
+        """
+        Prepare an image for upload.
+        
+        Args:
+            image: The decoded image
+            name: Name used when reporting savings
+            source_dpi: Resolution the image was scanned or rendered at, if known
+            original: The image's original encoded bytes, if it came from a file
+        
+        Returns:
+            The smallest acceptable encoding and its MIME type
+        """
+        if source_dpi is None and image.info.get('dpi'):
+            source_dpi = image.info['dpi'][0]
+        original_mime = MIME_TYPES.get(image.format or '')
+        
+        prepared = self._resize(self._normalize_mode(image), source_dpi)
+        candidates = self._encode(prepared)
+        # Resampling adds anti-aliased gray levels that can compress worse than the source;
+        # the model downscales oversized uploads itself, so a smaller original is still fine
+        if original is not None and original_mime:
+            candidates.append((original, original_mime))
+        data, mime_type = min(candidates, key=lambda candidate: len(candidate[0]))
+        
+        result = PreparedImage(
+            name=name,
+            data=data,
+            mime_type=mime_type,
+            width=prepared.width,
+            height=prepared.height,
+            raw_bytes=image.width * image.height * len(image.getbands()),
+            original_bytes=len(original) if original is not None else None
+        )
+        with self._lock:
+            if original is not None:
+                self.total_bytes_saved += result.bytes_saved
+            else:
+                self.rendered_raw_bytes += result.raw_bytes
+                self.rendered_upload_bytes += len(data)
+        return result
+    
+    def prepare_bytes(self, data: bytes, name: str) -> PreparedImage:
+        """Prepare an encoded image read from a file."""
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            return self.prepare(image, name, original=data)
@@ -1,25 +1,30 @@
 # document_processor/extractors/ocr_extractor.py
 import base64
-import json
+import logging
 from pathlib import Path
-from openai import OpenAI
-from PIL import Image
-import io
+from typing import Optional
+from llm_client import LLMClient, get_default_client
+from .image_preparer import ImagePreparer
+
+logger = logging.getLogger(__name__)
 
 class OCRExtractor:
     """Uses OpenAI's Vision model for text extraction from images."""
     
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-
-    def image_to_base64(self, image_path: Path) -> str:
-        """Convert image to base64 string."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-
+    def __init__(self, api_key: str, llm: Optional[LLMClient] = None):
+        self.llm = llm or get_default_client(api_key)
+        self.preparer = ImagePreparer()
+    
     def extract_text(self, image_path: Path) -> str:
         """Extract text from image using OpenAI's Vision model."""
-        base64_image = self.image_to_base64(image_path)
+        with open(image_path, "rb") as image_file:
+            prepared = self.preparer.prepare_bytes(image_file.read(), image_path.name)
+        logger.info("Prepared %s: %d -> %d bytes (%s)", image_path.name, prepared.original_bytes, len(prepared.data), prepared.mime_type)
+        return self.extract_text_from_bytes(prepared.data, image_path.name, prepared.mime_type)
+    
+    def extract_text_from_bytes(self, image_bytes: bytes, name: str, mime_type: str = "image/jpeg") -> str:
+        """Extract text from an in-memory encoded image using OpenAI's Vision model."""
+        base64_image = base64.b64encode(image_bytes).decode('utf-8')
         
         messages = [
             {
@@ -32,27 +37,19 @@ class OCRExtractor:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": f"data:{mime_type};base64,{base64_image}"
                         }
                     }
                 ]
             }
         ]
-        print(f"\nSending to OpenAI Vision (extract_text for {image_path.name}):")
-        print("Messages:", json.dumps([{**msg, "content": [
-            content if isinstance(content, str) else {**content, "image_url": {"url": "[BASE64_IMAGE]"}}
-            for content in msg["content"]
-        ]} for msg in messages], indent=2))
         
-        response = self.client.chat.completions.create(
+        response = self.llm.create(
             model="gpt-4-vision-preview",
             messages=messages,
-            max_tokens=4096
+            max_tokens=4096,
+            temperature=0,
+            stage='ocr'
         )
-        print("\nOpenAI Response:")
-        print(json.dumps({**response.model_dump(), "choices": [{
-            **choice,
-            "message": {**choice["message"], "content": choice["message"]["content"][:500] + "..." if len(choice["message"]["content"]) > 500 else choice["message"]["content"]}
-        } for choice in response.choices]}, indent=2))
         
         return response.choices[0].message.content
@@ -1,53 +1,170 @@
 # document_processor/extractors/pdf_extractor.py
 import pdfplumber
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+from llm_client import LLMClient
+from ..models.document import PAGE_BREAK
 from .base_extractor import BaseExtractor
 from .ocr_extractor import OCRExtractor
-import tempfile
+from .image_preparer import PreparedImage
+import logging
 import os
 from tqdm import tqdm
 
+logger = logging.getLogger(__name__)
+
 class PDFExtractor(BaseExtractor):
-    def __init__(self, api_key: str):
-        self.ocr_extractor = OCRExtractor(api_key)
+    """Extracts PDF text page by page, OCRing only the pages without a usable text layer."""
+    
+    version = "5"
+    
+    def __init__(
+        self,
+        api_key: str,
+        min_page_chars: int = 50,
+        ocr_workers: int = 4,
+        render_window: int = 4,
+        render_threads: Optional[int] = None,
+        render_dpi: Optional[int] = None,
+        llm: Optional[LLMClient] = None
+    ):
+        """
+        Initialize the extractor.
         
+        Args:
+            api_key: OpenAI API key used for OCR
+            min_page_chars: Pages with fewer extracted characters than this are OCRed
+            ocr_workers: Maximum number of concurrent OCR calls per document
+            render_window: Maximum number of pages rasterized in one poppler call
+            render_threads: Poppler processes used per window (default: CPU count)
+            render_dpi: Resolution pages are rasterized at (default: the OCR target DPI)
+            llm: Shared LLM client used for OCR calls
+        """
+        self.ocr_extractor = OCRExtractor(api_key, llm)
+        self.min_page_chars = min_page_chars
+        self.ocr_workers = ocr_workers
+        self.render_window = render_window
+        self.render_threads = render_threads or os.cpu_count() or 1
+        # Rendering straight at the target DPI avoids a downscale before upload
+        self.render_dpi = render_dpi or self.ocr_extractor.preparer.target_dpi
+        # Rendered pages waiting for OCR; with the window this bounds peak memory
+        self.max_pending_pages = ocr_workers * 2
+    
     def can_handle(self, file_path: Path) -> bool:
         """Check if this extractor can handle the given file."""
         return file_path.suffix.lower() == '.pdf'
     
-    def extract_text(self, file_path: Path) -> str:
+    def _extract_text_layer(self, file_path: Path) -> Optional[List[str]]:
+        """Return the text layer of every page, or None if the PDF cannot be parsed."""
         try:
-            # First try extracting with pdfplumber
             with pdfplumber.open(file_path) as pdf:
-                pages_text = []
-                for page in tqdm(pdf.pages, desc=f"Extracting text from {file_path.name}"):
-                    text = page.extract_text() or ""
-                    pages_text.append(text)
-                
-                text = "\n\n".join(pages_text)
+                return [
+                    page.extract_text() or ""
+                    for page in tqdm(pdf.pages, desc=f"Extracting text from {file_path.name}")
+                ]
+        except Exception as e:
+            logger.warning("Error extracting text layer from %s: %s", file_path.name, e)
+            return None
+    
+    def _windows(self, page_numbers: List[int]) -> Iterator[List[int]]:
+        """Group sorted page numbers into contiguous runs of at most render_window pages."""
+        window: List[int] = []
+        for page_number in page_numbers:
+            if window and (page_number != window[-1] + 1 or len(window) >= self.render_window):
+                yield window
+                window = []
+            window.append(page_number)
+        if window:
+            yield window
+    
+    def _render_pages(self, file_path: Path, page_numbers: List[int]) -> Iterator[Tuple[int, PreparedImage]]:
+        """Yield (page number, upload-ready image) for the given pages, one window at a time."""
+        for window in self._windows(page_numbers):
+            images = convert_from_path(
+                file_path,
+                dpi=self.render_dpi,
+                first_page=window[0],
+                last_page=window[-1],
+                thread_count=min(self.render_threads, len(window))
+            )
+            encoded = []
+            for page_number, image in zip(window, images):
+                encoded.append(self.ocr_extractor.preparer.prepare(
+                    image,
+                    f"{file_path.stem}_page_{page_number}",
+                    source_dpi=self.render_dpi
+                ))
+                image.close()
+            del images
+            yield from zip(window, encoded)
+    
+    def _ocr_pages(self, file_path: Path, page_numbers: List[int]) -> Dict[int, str]:
+        """
+        Render and OCR the given pages, keyed by page number.
+        
+        Rendering is streamed window by window and pauses while too many rendered
+        pages are still waiting for OCR, so memory is bounded by the window size
+        rather than the page count.
+        """
+        results: Dict[int, str] = {}
+        if not page_numbers:
+            return results
+        
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as pool, \
+                tqdm(total=len(page_numbers), desc="Processing pages with OCR") as progress:
+            pending = {}
+            raw = uploaded = 0
             
-            # If we got very little text, the PDF might be scanned/image-based
-            if len(text.strip()) < 50:
-                print(f"\nLittle text found in {file_path.name}, attempting OCR...")
-                # Create a temporary directory for image extraction
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    # Convert PDF to images
-                    images = convert_from_path(file_path)
-                    
-                    # Save images and process with OCR
-                    ocr_texts = []
-                    for i, image in enumerate(tqdm(images, desc="Processing pages with OCR")):
-                        img_path = Path(temp_dir) / f"page_{i+1}.png"
-                        image.save(img_path)
-                        ocr_text = self.ocr_extractor.extract_text(img_path)
-                        ocr_texts.append(ocr_text)
-                    
-                    text = "\n\n".join(ocr_texts)
+            def collect(futures) -> None:
+                for future in futures:
+                    results[pending.pop(future)] = future.result()
+                    progress.update(1)
             
-            return text
+            for page_number, prepared in self._render_pages(file_path, page_numbers):
+                while len(pending) >= self.max_pending_pages:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                # Run in a copy of the caller's context so OCR calls keep their metric tags
+                future = pool.submit(
+                    contextvars.copy_context().run,
+                    self.ocr_extractor.extract_text_from_bytes,
+                    prepared.data,
+                    prepared.name,
+                    prepared.mime_type
+                )
+                pending[future] = page_number
+                raw += prepared.raw_bytes
+                uploaded += len(prepared.data)
             
-        except Exception as e:
-            print(f"\nError extracting text from PDF: {e}")
-            # If pdfplumber fails, fall back to OCR
-            return self.ocr_extractor.extract_text(file_path)
+            collect(list(pending))
+        
+        # Rendered pages have no encoded original, so they are measured against their raw pixels
+        logger.info("OCR image payloads for %s: %d raw pixel bytes uploaded as %d bytes", file_path.name, raw, uploaded)
+        return results
+    
+    def extract_text(self, file_path: Path) -> str:
+        pages_text = self._extract_text_layer(file_path)
+        if pages_text is None:
+            # No usable text layer at all: render and OCR every page
+            page_count = pdfinfo_from_path(file_path)["Pages"]
+            pages_text = [""] * page_count
+        
+        # Only pages with (almost) no text layer are likely scanned and need OCR
+        ocr_page_numbers = [
+            i + 1 for i, text in enumerate(pages_text)
+            if len(text.strip()) < self.min_page_chars
+        ]
+        if ocr_page_numbers:
+            logger.info(
+                "Little text found on %d of %d pages in %s, attempting OCR...",
+                len(ocr_page_numbers), len(pages_text), file_path.name
+            )
+        
+        for page_number, text in self._ocr_pages(file_path, ocr_page_numbers).items():
+            pages_text[page_number - 1] = text
+        
+        # Page breaks are kept as marker lines so section splitting can use them
+        return f"\n{PAGE_BREAK}\n".join(pages_text)
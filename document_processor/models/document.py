@@ -3,6 +3,9 @@ from dataclasses import dataclass
 from typing import List, Optional
 from datetime import datetime
 
+# Line separating the pages of multi-page documents in extracted text
+PAGE_BREAK = "\f"
+
 @dataclass
 class DocumentSection:
     """Represents a distinct document section found within a file."""
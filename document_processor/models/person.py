@@ -13,6 +13,7 @@ class Person:
     passport_number: Optional[str] = None
     address: Optional[str] = None
     position: Optional[str] = None
+    company_id: Optional[str] = None
     
     @classmethod
     def from_json(cls, data: dict) -> 'Person':
@@ -28,6 +29,9 @@ class Person:
                     # Handle timestamp in milliseconds
                     timestamp_ms = int(data['dob']['$date']['$numberLong'])
                     date_of_birth = datetime.fromtimestamp(timestamp_ms / 1000)
+                elif isinstance(data['dob']['$date'], int):
+                    # Timestamp already unwrapped by the streaming loader
+                    date_of_birth = datetime.fromtimestamp(data['dob']['$date'] / 1000)
                 else:
                     # Handle ISO date string
                     date_of_birth = datetime.fromisoformat(data['dob']['$date'].replace('Z', '+00:00'))
@@ -53,6 +57,11 @@ class Person:
         if data.get('roles'):
             position = ', '.join(data['roles'])
 
+        # Get the company this person record belongs to
+        company_id = data.get('companyId')
+        if isinstance(company_id, dict):
+            company_id = company_id.get('$oid')
+
         # Get passport number from document data
         passport_number = None
         if data.get('passportOrIdDocument', {}).get('documentNumber'):
@@ -68,5 +77,6 @@ class Person:
             date_of_birth=date_of_birth,
             passport_number=passport_number,
             address=address,
-            position=position
+            position=position,
+            company_id=str(company_id) if company_id else None
         )
@@ -0,0 +1,182 @@
+# document_processor/ownership.py
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from .data_loader import DataLoader
+from .models.person import Person
+
+@dataclass(frozen=True)
+class OwnershipLink:
+    """One shareholding: owner holds percentage of company."""
+    owner_id: str
+    company_id: str
+    percentage: float
+
+@dataclass(frozen=True)
+class OwnershipPath:
+    """A chain of shareholdings from a natural person down to the target company."""
+    links: Tuple[OwnershipLink, ...]
+    
+    @property
+    def percentage(self) -> float:
+        """Effective percentage carried by this chain (product of its stakes)."""
+        fraction = 1.0
+        for link in self.links:
+            fraction *= link.percentage / 100
+        return fraction * 100
+    
+    def to_dict(self) -> dict:
+        return {
+            "percentage": self.percentage,
+            "links": [
+                {"owner_id": link.owner_id, "company_id": link.company_id, "percentage": link.percentage}
+                for link in self.links
+            ]
+        }
+
+@dataclass
+class BeneficialOwner:
+    """A natural person's effective ownership of a company and the chains it comes through."""
+    person_id: str
+    person: Optional[Person]
+    paths: List[OwnershipPath] = field(default_factory=list)
+    
+    @property
+    def percentage(self) -> float:
+        return sum(path.percentage for path in self.paths)
+    
+    def to_dict(self) -> dict:
+        name = f"{self.person.first_name} {self.person.last_name}" if self.person else self.person_id
+        return {
+            "person_id": self.person_id,
+            "name": name,
+            "percentage": round(self.percentage, 4),
+            "paths": [path.to_dict() for path in self.paths]
+        }
+
+# Chains upward from a company, as (person id, links from the person down to the company)
+Chains = Dict[str, List[Tuple[OwnershipLink, ...]]]
+
+NO_CUT = float('inf')
+
+class OwnershipGraph:
+    """
+    Effective (look-through) ownership over the share chains in a DataLoader.
+    
+    A person's effective stake in a company is the sum, over every simple path
+    of shareholdings from the person to the company, of the product of the
+    stakes along the path. A cycle (cross-holding) is followed once and cut
+    where it would revisit a company already on the path, so every chain is
+    finite and counted once.
+    
+    Upstream chains are memoized per company and reused across targets. A
+    company's chains are only memoized when none of its cycles were cut at a
+    company above it on the current path, since those results depend on how
+    the company was reached.
+    
+    Chains only reach as far as the shares the loader holds, so a loader scoped
+    with company_ids must include the holding companies above the target.
+    """
+    
+    def __init__(self, loader: DataLoader, max_depth: int = 20):
+        """
+        Initialize the graph.
+        
+        Args:
+            loader: Loaded structured data with shares indexed by company
+            max_depth: Longest chain of companies followed upward from the target
+        """
+        self.loader = loader
+        self.max_depth = max_depth
+        self._memo: Dict[str, Chains] = {}
+        self._memo_revision = loader.revision
+    
+    def invalidate(self) -> None:
+        """Forget memoized chains, e.g. after shares were added to the loader."""
+        self._memo.clear()
+        self._memo_revision = self.loader.revision
+    
+    def _reuse(self, memoized: Chains, stack: Dict[str, int]) -> Tuple[Chains, float]:
+        """
+        Reuse the memoized chains of a company from the current path.
+        
+        Memoized chains are all simple paths into the company; those through a
+        company already on the path are dropped, which makes the result depend
+        on the path like a cut cycle would.
+        """
+        chains: Chains = {}
+        lowest_cut = NO_CUT
+        for person_id, person_chains in memoized.items():
+            kept = []
+            for chain in person_chains:
+                on_path = [stack[link.company_id] for link in chain if link.company_id in stack]
+                if on_path:
+                    lowest_cut = min(lowest_cut, min(on_path))
+                else:
+                    kept.append(chain)
+            if kept:
+                chains[person_id] = kept
+        return chains, lowest_cut
+    
+    def _chains(self, company_id: str, stack: Dict[str, int]) -> Tuple[Chains, float]:
+        """
+        Collect the person chains above a company.
+        
+        Returns:
+            (chains, shallowest stack depth at which a cycle was cut, or NO_CUT)
+        """
+        if company_id in self._memo:
+            return self._reuse(self._memo[company_id], stack)
+        
+        depth = len(stack)
+        stack[company_id] = depth
+        chains: Chains = defaultdict(list)
+        lowest_cut = NO_CUT
+        
+        for share in self.loader.get_shares_for_company(company_id):
+            owner = share.owner
+            if owner is None:
+                continue
+            link = OwnershipLink(owner.id, company_id, share.percentage)
+            if isinstance(owner, Person):
+                chains[owner.id].append((link,))
+            elif owner.id in stack:
+                # Cross-holding: stop before revisiting a company on this path
+                lowest_cut = min(lowest_cut, stack[owner.id])
+            elif depth + 1 >= self.max_depth:
+                # Truncated by depth, which depends on the path taken: never memoize above
+                lowest_cut = -1
+            else:
+                upstream, cut = self._chains(owner.id, stack)
+                lowest_cut = min(lowest_cut, cut)
+                for person_id, person_chains in upstream.items():
+                    chains[person_id].extend(chain + (link,) for chain in person_chains)
+        
+        del stack[company_id]
+        chains = dict(chains)
+        if lowest_cut >= depth:
+            self._memo[company_id] = chains
+        return chains, lowest_cut
+    
+    def effective_ownership(self, company_id: str) -> List[BeneficialOwner]:
+        """Every natural person with an effective stake in a company, largest first."""
+        if self.loader.revision != self._memo_revision:
+            self.invalidate()
+        chains, _ = self._chains(company_id, {})
+        owners = [
+            BeneficialOwner(
+                person_id=person_id,
+                person=self.loader.get_person_by_id(person_id),
+                paths=[OwnershipPath(chain) for chain in person_chains]
+            )
+            for person_id, person_chains in chains.items()
+        ]
+        return sorted(owners, key=lambda owner: owner.percentage, reverse=True)
+    
+    def beneficial_owners(self, company_id: str, threshold: float = 25.0) -> List[BeneficialOwner]:
+        """Persons whose effective stake in a company is at least threshold percent."""
+        # Tolerance for stakes like 3 x 8.3333% that should add up to exactly 25%
+        return [
+            owner for owner in self.effective_ownership(company_id)
+            if owner.percentage >= threshold - 1e-9
+        ]
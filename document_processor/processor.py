@@ -1,41 +1,96 @@
 import os
 import json
+import asyncio
+import logging
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from .cache import ResultCache, hash_file, hash_text, make_key
+from .concurrency import ConcurrencyLimits, StageLimiter
+from llm_client import LLMClient, get_default_client, span
 from .data_loader import DataLoader
 from .categorizer.document_categorizer import DocumentCategorizer
+from .categorizer.local_classifier import LocalClassifier
 from .summariser.document_summarizer import DocumentSummarizer
 from .extractors.pdf_extractor import PDFExtractor
 from .extractors.image_extractor import ImageExtractor
 from .extractors.text_extractor import TextExtractor
 from .extractors.base_extractor import BaseExtractor
+from .models.document import DocumentSection
+from .store import DocumentStore
+
+logger = logging.getLogger(__name__)
 
 class DocumentProcessor:
     """Main class for processing documents through the pipeline."""
     
-    def __init__(self, api_key: str, data_dir: Path, schema_dir: Path):
-        """Initialize the document processor with necessary components."""
+    def __init__(
+        self,
+        api_key: str,
+        data_dir: Path,
+        schema_dir: Path,
+        cache_dir: Optional[Path] = None,
+        cache_max_bytes: int = 512 * 1024 * 1024,
+        llm: Optional[LLMClient] = None,
+        single_pass: bool = True,
+        local_threshold: Optional[float] = 0.85,
+        local_audit_rate: float = 0.05,
+        store_path: Optional[Path] = None
+    ):
+        """
+        Initialize the document processor with necessary components.
+        
+        Args:
+            api_key: OpenAI API key
+            data_dir: Directory with structured data and input documents
+            schema_dir: Directory containing category schemas
+            cache_dir: Directory for cached stage results (default: data_dir/cache)
+            cache_max_bytes: Size bound of the stage result cache
+            llm: Shared LLM client (default: the process-wide client for api_key)
+            single_pass: Categorize and extract each section in one combined request
+            local_threshold: Confidence at which the local classifier's category is used
+                without an LLM call; None disables the local classifier
+            local_audit_rate: Fraction of confidently classified sections still sent to
+                the LLM to measure the accuracy of the sections that are skipped
+            store_path: SQLite file of processed documents (default: data_dir/documents.sqlite3)
+        """
         self.data_dir = data_dir
         self.schema_dir = schema_dir
         self.api_key = api_key
+        self.single_pass = single_pass
+        self.local_threshold = local_threshold
+        self.local_audit_rate = local_audit_rate
+        self.llm = llm or get_default_client(api_key)
         
         # Initialize components
-        self.categorizer = DocumentCategorizer(schema_dir)
-        self.summarizer = DocumentSummarizer(api_key, schema_dir)
+        self.categorizer = DocumentCategorizer(schema_dir, self.llm)
+        self.summarizer = DocumentSummarizer(api_key, schema_dir, self.llm)
         self.data_loader = DataLoader(data_dir)
+        self.cache = ResultCache(cache_dir or data_dir / 'cache', max_bytes=cache_max_bytes)
+        self.local_classifier_path = self.cache.cache_dir / 'local_classifier.json'
+        self.local_classifier = LocalClassifier.load(self.local_classifier_path, self.categorizer.categories)
         
         # Initialize extractors
         self.extractors: List[BaseExtractor] = [
-            PDFExtractor(api_key),
-            ImageExtractor(api_key),
+            PDFExtractor(api_key, llm=self.llm),
+            ImageExtractor(api_key, self.llm),
             TextExtractor()
         ]
         
-        # Create output directories
-        self.text_output_dir = data_dir / 'text_output'
-        self.json_output_dir = data_dir / 'json_output'
-        self.text_output_dir.mkdir(parents=True, exist_ok=True)
-        self.json_output_dir.mkdir(parents=True, exist_ok=True)
+        # Processed documents, resumed from on later runs
+        self.store = DocumentStore(store_path or data_dir / 'documents.sqlite3')
+        legacy_dir = data_dir / 'json_output'
+        if legacy_dir.is_dir() and not self.store.count():
+            self.store.import_json_outputs(legacy_dir, data_dir / 'text_output')
+        
+        # Results are reused only from the same versions of every stage
+        self.pipeline_key = make_key(
+            self.categorizer.sections_version,
+            self.categorizer.version,
+            ','.join(sorted(self.categorizer.categories)),
+            self.summarizer.version,
+            json.dumps(self.summarizer.schema_versions, sort_keys=True),
+            self.single_pass
+        )
     
     def _get_extractor(self, file_path: Path) -> Optional[BaseExtractor]:
         """Get appropriate extractor for the file type."""
@@ -44,99 +99,313 @@ class DocumentProcessor:
             None
         )
     
-    def _save_text_output(self, file_path: Path, text: str) -> Path:
-        """Save extracted text to output file."""
-        output_path = self.text_output_dir / f"{file_path.stem}.txt"
-        with open(output_path, 'w') as f:
-            f.write(text)
-        print(f"Saved text to: {output_path}")
-        return output_path
-    
-    def _save_json_output(self, file_path: Path, data: dict) -> Path:
-        """Save processed data to JSON file."""
-        output_path = self.json_output_dir / f"{file_path.stem}.json"
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
-        print(f"Saved JSON to: {output_path}")
-        return output_path
-    
-    def _load_existing_results(self, file_path: Path) -> Optional[dict]:
-        """Load existing processing results if available."""
-        text_path = self.text_output_dir / f"{file_path.stem}.txt"
-        json_path = self.json_output_dir / f"{file_path.stem}.json"
-        
-        if text_path.exists() and json_path.exists():
-            try:
-                with open(json_path) as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Error loading JSON for {file_path}")
-        return None
-    
-    def process_file(self, file_path: Path) -> Optional[dict]:
-        """Process a single file through the pipeline."""
+    def _pipeline(self, extractor: BaseExtractor) -> str:
+        return make_key(self.pipeline_key, type(extractor).__name__, extractor.version)
+    
+    def _save_result(self, case_id: str, result: dict, text: str) -> None:
+        """Store a processed file with its extracted text."""
+        self.store.put_documents(case_id, [(result, text)])
+        logger.info("Stored %s (%d sections) for case %s", result["source_file"], len(result["sections"]), case_id)
+    
+    def _resume(self, case_id: str, file_path: Path, file_hash: str, extractor: BaseExtractor) -> Optional[dict]:
+        """Return the stored result of an identical file processed by the same pipeline, if any."""
+        stored = self.store.find(file_hash, self._pipeline(extractor), case_id)
+        if stored is None:
+            return None
+        logger.info("Resuming stored result for: %s", file_path)
+        result = {
+            "source_file": str(file_path),
+            "file_hash": file_hash,
+            "pipeline": stored["pipeline"],
+            "sections": stored["sections"]
+        }
+        # Record the file under this case too, e.g. when another case had the same document
+        if (stored["case_id"], stored["source_file"]) != (case_id, str(file_path)):
+            self._save_result(case_id, result, self.store.get_text(stored["case_id"], stored["source_file"]) or '')
+        return result
+    
+    def _extraction_key(self, extractor: BaseExtractor, file_hash: str) -> str:
+        return make_key(file_hash, type(extractor).__name__, extractor.version)
+    
+    def _sections_key(self, extraction_key: str) -> str:
+        return make_key(extraction_key, self.categorizer.sections_version)
+    
+    def _categorization_key(self, content_hash: str) -> str:
+        return make_key(content_hash, self.categorizer.version, ','.join(sorted(self.categorizer.categories)))
+    
+    def _summarization_key(self, section: DocumentSection, content_hash: str) -> str:
+        return make_key(
+            content_hash,
+            section.category,
+            self.summarizer.schema_versions.get(section.category, ''),
+            self.summarizer.version
+        )
+    
+    def _extract_text(self, extractor: BaseExtractor, file_path: Path, file_hash: str) -> Tuple[str, str]:
+        """Extract text from a file, reusing the cached result for identical content."""
+        key = self._extraction_key(extractor, file_hash)
+        text = self.cache.get('extraction', key)
+        if text is None:
+            text = extractor.extract_text(file_path)
+            self.cache.put('extraction', key, text)
+        else:
+            logger.info("Using cached extraction for: %s", file_path)
+        return text, key
+    
+    def _get_cached_sections(self, key: str) -> Optional[List[DocumentSection]]:
+        cached = self.cache.get('sections', key)
+        if cached is None:
+            return None
+        return [DocumentSection(**section) for section in cached]
+    
+    def _put_cached_sections(self, key: str, sections: List[DocumentSection]) -> None:
+        self.cache.put('sections', key, [
+            {
+                "content": section.content,
+                "start_line": section.start_line,
+                "end_line": section.end_line
+            }
+            for section in sections
+        ])
+    
+    def _put_cached_summary(self, key: str, summary: dict) -> None:
+        # Failed parses are not cached so they are retried on the next run
+        if 'error' not in summary:
+            self.cache.put('summarization', key, summary)
+    
+    def _identify_sections(self, text: str, extraction_key: str) -> List[DocumentSection]:
+        """Split text into sections, reusing cached boundaries for identical text."""
+        key = self._sections_key(extraction_key)
+        sections = self._get_cached_sections(key)
+        if sections is None:
+            sections = self.categorizer.identify_sections(text)
+            self._put_cached_sections(key, sections)
+        return sections
+    
+    def train_local_classifier(self) -> int:
+        """Retrain the local classifier from past LLM categorizations and save it."""
+        examples = self.local_classifier.train(self.store.iter_training_examples())
+        if examples:
+            self.local_classifier.save(self.local_classifier_path)
+        logger.info("Trained local classifier on %d sections", examples)
+        return examples
+    
+    def _predict_locally(self, section: DocumentSection, content_hash: str) -> Tuple[Optional[str], bool, bool]:
+        """
+        Run the local classifier on a section.
+        
+        Returns:
+            (predicted category, whether the prediction is trusted without the LLM,
+            whether it was confident enough but sent to the LLM as an audit)
+        """
+        if self.local_threshold is None:
+            return None, False, False
+        predicted, confidence = self.local_classifier.predict(section.content)
+        trusted = predicted is not None and confidence >= self.local_threshold
+        # Deterministic sample of confident sections still goes to the LLM as an audit
+        audited = trusted and int(content_hash[:8], 16) / 0xFFFFFFFF < self.local_audit_rate
+        if audited:
+            trusted = False
+        self.local_classifier.stats.record_prediction(skipped=trusted)
+        return predicted, trusted, audited
+    
+    def _record_agreement(self, predicted: Optional[str], category: str, audited: bool = False) -> None:
+        if predicted is not None:
+            self.local_classifier.stats.record_comparison(predicted == category, audited)
+    
+    def _store_combined(
+        self,
+        section: DocumentSection,
+        content_hash: str,
+        predicted: Optional[str],
+        audited: bool,
+        category: str,
+        summary: dict
+    ) -> dict:
+        """Cache a single-pass result under both its categorization and summarization keys."""
+        self._record_agreement(predicted, category, audited)
+        section.category = category
+        self.cache.put('categorization', self._categorization_key(content_hash), category)
+        self._put_cached_summary(self._summarization_key(section, content_hash), summary)
+        return self._section_result(section, summary)
+    
+    def _process_section(self, section: DocumentSection) -> dict:
+        """Categorize and summarize one section, reusing cached stage results."""
+        with span('section', section=f"{section.start_line}-{section.end_line}"):
+            content_hash = hash_text(section.content)
+            
+            key = self._categorization_key(content_hash)
+            category = self.cache.get('categorization', key)
+            predicted, trusted, audited = (None, False, False) if category is not None else self._predict_locally(section, content_hash)
+            if trusted:
+                category = predicted
+            if category is None and self.single_pass:
+                combined = self.summarizer.categorize_and_summarize(section)
+                if combined:
+                    return self._store_combined(section, content_hash, predicted, audited, *combined)
+            if category is None:
+                category = self.categorizer.categorize_section(section)
+                self._record_agreement(predicted, category, audited)
+                self.cache.put('categorization', key, category)
+            section.category = category
+            
+            # Summaries are keyed on the category's schema version, so a schema change
+            # re-runs only this step
+            key = self._summarization_key(section, content_hash)
+            summary = self.cache.get('summarization', key)
+            if summary is None:
+                summary = self.summarizer.summarize_section(section)
+                self._put_cached_summary(key, summary)
+            
+            return self._section_result(section, summary, "local" if trusted else "llm")
+    
+    def _section_result(self, section: DocumentSection, summary: dict, category_source: str = "llm") -> dict:
+        return {
+            "category": section.category,
+            "content": summary,
+            "text": section.content,
+            "metadata": {
+                "start_line": section.start_line,
+                "end_line": section.end_line,
+                "category_source": category_source
+            }
+        }
+    
+    def _should_process(self, file_path: Path) -> Optional[BaseExtractor]:
+        """Return the extractor for a file, or None if the file should be skipped."""
         # Skip JSON files
         if file_path.suffix.lower() == '.json':
-            print(f"Skipping JSON file: {file_path}")
+            logger.info("Skipping JSON file: %s", file_path)
             return None
         
-        # Check for existing results
-        existing = self._load_existing_results(file_path)
-        if existing:
-            print(f"Using existing results for: {file_path}")
-            return existing
-        
         # Get appropriate extractor
         extractor = self._get_extractor(file_path)
         if not extractor:
-            print(f"No extractor found for: {file_path}")
+            logger.warning("No extractor found for: %s", file_path)
+        return extractor
+    
+    def process_file(self, file_path: Path, case_id: Optional[str] = None) -> Optional[dict]:
+        """Process a single file through the pipeline and store it under its case (default: its directory name)."""
+        extractor = self._should_process(file_path)
+        if not extractor:
             return None
+        case_id = case_id or file_path.parent.name
         
         try:
-            print(f"\nProcessing: {file_path}")
+            with span('file', file=file_path.name):
+                # Extract text, keyed on the file contents rather than its name
+                file_hash = hash_file(file_path)
+                resumed = self._resume(case_id, file_path, file_hash, extractor)
+                if resumed:
+                    return resumed
+                
+                logger.info("Processing: %s", file_path)
+                text, extraction_key = self._extract_text(extractor, file_path, file_hash)
+                
+                # Identify and process sections
+                sections = self._identify_sections(text, extraction_key)
+                processed_sections = [self._process_section(section) for section in sections]
+                
+                # Save results
+                result = {
+                    "source_file": str(file_path),
+                    "file_hash": file_hash,
+                    "pipeline": self._pipeline(extractor),
+                    "sections": processed_sections
+                }
+                self._save_result(case_id, result, text)
+                return result
+        
+        except Exception as e:
+            logger.exception("Error processing %s: %s", file_path, e)
+            return None
+    
+    async def _process_section_async(self, section: DocumentSection, limiter: StageLimiter) -> dict:
+        """Categorize and summarize one section, bounded by the stage limits."""
+        with span('section', section=f"{section.start_line}-{section.end_line}"):
+            content_hash = hash_text(section.content)
             
-            # Extract text
-            text = extractor.extract_text(file_path)
-            self._save_text_output(file_path, text)
+            key = self._categorization_key(content_hash)
+            category = self.cache.get('categorization', key)
+            predicted, trusted, audited = (None, False, False) if category is not None else self._predict_locally(section, content_hash)
+            if trusted:
+                category = predicted
+            if category is None and self.single_pass:
+                async with limiter.slot('categorization'):
+                    combined = await self.summarizer.categorize_and_summarize_async(section)
+                if combined:
+                    return self._store_combined(section, content_hash, predicted, audited, *combined)
+            if category is None:
+                async with limiter.slot('categorization'):
+                    category = await self.categorizer.categorize_section_async(section)
+                self._record_agreement(predicted, category, audited)
+                self.cache.put('categorization', key, category)
+            section.category = category
             
-            # Identify and process sections
-            sections = self.categorizer.identify_sections(text)
-            processed_sections = []
+            key = self._summarization_key(section, content_hash)
+            summary = self.cache.get('summarization', key)
+            if summary is None:
+                async with limiter.slot('summarization'):
+                    summary = await self.summarizer.summarize_section_async(section)
+                self._put_cached_summary(key, summary)
             
-            for section in sections:
-                # Categorize and summarize section
-                category = self.categorizer.categorize_section(section)
-                summary = self.summarizer.summarize_section(section)
-                
-                processed_sections.append({
-                    "category": category,
-                    "content": summary,
-                    "text": section.content,
-                    "metadata": {
-                        "start_line": section.start_line,
-                        "end_line": section.end_line
+            return self._section_result(section, summary, "local" if trusted else "llm")
+    
+    async def process_file_async(
+        self,
+        file_path: Path,
+        limiter: Optional[StageLimiter] = None,
+        case_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """Async variant of process_file; sections of the file are processed concurrently."""
+        limiter = limiter or StageLimiter()
+        extractor = self._should_process(file_path)
+        if not extractor:
+            return None
+        case_id = case_id or file_path.parent.name
+        
+        try:
+            async with limiter.file_slot():
+                with span('file', file=file_path.name):
+                    # Extraction and the store's SQLite transactions are blocking, so they
+                    # run in worker threads
+                    async with limiter.slot('extraction'):
+                        file_hash = await asyncio.to_thread(hash_file, file_path)
+                        resumed = await asyncio.to_thread(self._resume, case_id, file_path, file_hash, extractor)
+                        if resumed:
+                            return resumed
+                        logger.info("Processing: %s", file_path)
+                        text, extraction_key = await asyncio.to_thread(
+                            self._extract_text, extractor, file_path, file_hash
+                        )
+                    
+                    key = self._sections_key(extraction_key)
+                    sections = self._get_cached_sections(key)
+                    if sections is None:
+                        # Slots are taken per window call, so long documents share the stage limit
+                        sections = await self.categorizer.identify_sections_async(text, limiter)
+                        self._put_cached_sections(key, sections)
+                    
+                    # gather preserves input order, so sections keep their sequential order
+                    processed_sections = await asyncio.gather(*(
+                        self._process_section_async(section, limiter) for section in sections
+                    ))
+                    
+                    result = {
+                        "source_file": str(file_path),
+                        "file_hash": file_hash,
+                        "pipeline": self._pipeline(extractor),
+                        "sections": list(processed_sections)
                     }
-                })
-            
-            # Save results
-            result = {
-                "source_file": str(file_path),
-                "sections": processed_sections
-            }
-            self._save_json_output(file_path, result)
-            return result
-            
+                    await asyncio.to_thread(self._save_result, case_id, result, text)
+                    return result
+        
         except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+            logger.exception("Error processing %s: %s", file_path, e)
             return None
     
-    def process_directory(self, input_dir: Optional[Path] = None) -> Dict[str, List[dict]]:
-        """Process all documents in the input directory."""
-        print("Processing documents...")
-        
-        # Load structured data first
-        self.data_loader.load_all()
-        
+    def _list_input_files(self, input_dir: Optional[Path]) -> Tuple[Path, List[Path]]:
+        """Resolve the input directory and list its files in a deterministic order."""
         # Use default input directory if none provided
         if input_dir is None:
             input_dir = self.data_dir / 'input_documents'
@@ -144,15 +413,82 @@ class DocumentProcessor:
         if not input_dir.exists():
             raise Exception(f"Input directory not found: {input_dir}")
         
-        # Process each file
+        return input_dir, sorted(input_dir.glob('*.*'))
+    
+    def _merge_results(self, results: List[Optional[dict]]) -> Dict[str, List[dict]]:
+        """Group section summaries by category, in file then section order."""
         processed_docs: Dict[str, List[dict]] = {}
-        for file_path in input_dir.glob('*.*'):
-            result = self.process_file(file_path)
+        for result in results:
             if result and 'sections' in result:
                 for section in result['sections']:
                     category = section['category']
                     if category not in processed_docs:
                         processed_docs[category] = []
                     processed_docs[category].append(section['content'])
-        
         return processed_docs
+    
+    def process_directory(
+        self,
+        input_dir: Optional[Path] = None,
+        concurrent: bool = True,
+        limits: Optional[ConcurrencyLimits] = None,
+        case_id: Optional[str] = None
+    ) -> Dict[str, List[dict]]:
+        """
+        Process all documents in the input directory.
+        
+        Files already in the document store, processed by the same pipeline
+        versions, are resumed from it rather than processed again.
+        
+        Args:
+            input_dir: Directory of input documents (default: data_dir/input_documents)
+            concurrent: Process files and sections concurrently with the async pipeline
+            limits: Concurrency limits for the async pipeline
+            case_id: Case the documents are stored under (default: the input directory name)
+        
+        Returns:
+            Section summaries grouped by category
+        """
+        if concurrent:
+            return asyncio.run(self.process_directory_async(input_dir, limits, case_id=case_id))
+        
+        logger.info("Processing documents...")
+        
+        # Load structured data first, once per run
+        if not self.data_loader.loaded:
+            self.data_loader.load_all()
+        
+        # Process each file
+        input_dir, files = self._list_input_files(input_dir)
+        results = [self.process_file(file_path, case_id or input_dir.name) for file_path in files]
+        logger.info("Local classifier: %s", self.local_classifier.stats.report())
+        return self._merge_results(results)
+    
+    async def process_directory_async(
+        self,
+        input_dir: Optional[Path] = None,
+        limits: Optional[ConcurrencyLimits] = None,
+        limiter: Optional[StageLimiter] = None,
+        case_id: Optional[str] = None
+    ) -> Dict[str, List[dict]]:
+        """
+        Async variant of process_directory; produces the same category map.
+        
+        A limiter shared between concurrent calls (e.g. one per company in a
+        batch run) bounds their combined concurrency; otherwise one is created
+        from limits.
+        """
+        logger.info("Processing documents...")
+        
+        # Load structured data first, once per run
+        if not self.data_loader.loaded:
+            self.data_loader.load_all()
+        
+        limiter = limiter or StageLimiter(limits)
+        input_dir, files = self._list_input_files(input_dir)
+        results = await asyncio.gather(*(
+            self.process_file_async(file_path, limiter, case_id or input_dir.name)
+            for file_path in files
+        ))
+        logger.info("Local classifier: %s", self.local_classifier.stats.report())
+        return self._merge_results(results)
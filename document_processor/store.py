@@ -0,0 +1,273 @@
+# document_processor/store.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class DocumentStore:
+    """
+    Processed documents in a single SQLite file: extracted text, sections,
+    categories, summaries and metadata.
+    
+    Documents are indexed by case, file hash and processing date, and their
+    sections by category, so past results can be queried without reading
+    them all into memory. Documents are written in transactions and read
+    back as streams.
+    """
+    
+    # Rows fetched at a time by the streaming readers
+    BATCH_SIZE = 500
+    
+    def __init__(self, db_path: Path):
+        """
+        Initialize the store.
+        
+        Args:
+            db_path: SQLite database file, created if missing
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                case_id TEXT NOT NULL,
+                source_file TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                pipeline TEXT NOT NULL,
+                text TEXT NOT NULL,
+                complete INTEGER NOT NULL,
+                processed_at REAL NOT NULL,
+                UNIQUE (case_id, source_file)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(file_hash, pipeline);
+            CREATE INDEX IF NOT EXISTS idx_documents_processed_at ON documents(processed_at);
+            CREATE TABLE IF NOT EXISTS sections (
+                document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                case_id TEXT NOT NULL,
+                category TEXT NOT NULL,
+                category_source TEXT,
+                summary TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                processed_at REAL NOT NULL,
+                PRIMARY KEY (document_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_sections_category ON sections(category, processed_at);
+            CREATE INDEX IF NOT EXISTS idx_sections_case ON sections(case_id, category);
+        """)
+    
+    def put_documents(self, case_id: str, documents: Iterable[Tuple[dict, str]]) -> int:
+        """
+        Store processed documents of a case in one transaction.
+        
+        Args:
+            case_id: Case (e.g. company) the documents belong to
+            documents: (result, extracted text) pairs; a result has source_file,
+                file_hash, pipeline and sections, as produced by DocumentProcessor
+        
+        Returns:
+            Number of documents stored; a document replaces an earlier one with
+            the same case and source file
+        """
+        now = time.time()
+        count = 0
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for result, text in documents:
+                    sections = result.get("sections", [])
+                    # Failed summaries are not final, so the document is processed again
+                    complete = all('error' not in (section.get("content") or {}) for section in sections)
+                    self._conn.execute(
+                        "DELETE FROM documents WHERE case_id = ? AND source_file = ?",
+                        (case_id, result["source_file"])
+                    )
+                    document_id = self._conn.execute(
+                        "INSERT INTO documents (case_id, source_file, file_hash, pipeline, text, complete, processed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (case_id, result["source_file"], result["file_hash"], result.get("pipeline", ''), text, int(complete), now)
+                    ).lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO sections (document_id, position, case_id, category, category_source, summary, text, metadata, processed_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                document_id,
+                                position,
+                                case_id,
+                                section["category"],
+                                section.get("metadata", {}).get("category_source"),
+                                json.dumps(section["content"]),
+                                section.get("text", ''),
+                                json.dumps(section.get("metadata", {})),
+                                now
+                            )
+                            for position, section in enumerate(sections)
+                        ]
+                    )
+                    count += 1
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return count
+    
+    def find(self, file_hash: str, pipeline: str, case_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Return a complete result for a file processed by the same pipeline, so
+        a rerun can resume without processing it again. A result of the given
+        case is preferred, but identical files give identical results in any case.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, case_id, source_file FROM documents WHERE file_hash = ? AND pipeline = ? AND complete = 1"
+                " ORDER BY case_id = ? DESC, processed_at DESC LIMIT 1",
+                (file_hash, pipeline, case_id)
+            ).fetchone()
+            if row is None:
+                return None
+            document_id, stored_case, source_file = row
+            sections = self._conn.execute(
+                "SELECT category, summary, text, metadata FROM sections WHERE document_id = ? ORDER BY position",
+                (document_id,)
+            ).fetchall()
+        return {
+            "case_id": stored_case,
+            "source_file": source_file,
+            "file_hash": file_hash,
+            "pipeline": pipeline,
+            "sections": [
+                {
+                    "category": category,
+                    "content": json.loads(summary),
+                    "text": text,
+                    "metadata": json.loads(metadata)
+                }
+                for category, summary, text, metadata in sections
+            ]
+        }
+    
+    def get_text(self, case_id: str, source_file: str) -> Optional[str]:
+        """Return the extracted text of a stored document."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM documents WHERE case_id = ? AND source_file = ?", (case_id, source_file)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _stream(self, query: str, params: Tuple[Any, ...]) -> Iterator[tuple]:
+        """Yield rows in batches from a connection of their own, so readers never hold the store's lock."""
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self.BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def iter_sections(
+        self,
+        category: Optional[str] = None,
+        case_id: Optional[str] = None,
+        since: Optional[float] = None
+    ) -> Iterator[dict]:
+        """
+        Stream stored sections, optionally of one category, case and processed since a time.
+        
+        Sections come in processing order, and in file then section order within a run.
+        """
+        conditions, params = [], []
+        for column, value in (('category', category), ('case_id', case_id)):
+            if value is not None:
+                conditions.append(f"s.{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("s.processed_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = (
+            "SELECT s.case_id, d.source_file, d.file_hash, s.category, s.summary, s.text, s.metadata, s.processed_at"
+            " FROM sections s JOIN documents d ON d.id = s.document_id"
+            f" {where} ORDER BY s.processed_at, d.source_file, s.position"
+        )
+        for case, source_file, file_hash, section_category, summary, text, metadata, processed_at in self._stream(query, tuple(params)):
+            yield {
+                "case_id": case,
+                "source_file": source_file,
+                "file_hash": file_hash,
+                "category": section_category,
+                "content": json.loads(summary),
+                "text": text,
+                "metadata": json.loads(metadata),
+                "processed_at": processed_at
+            }
+    
+    def category_map(self, case_id: str) -> Dict[str, List[dict]]:
+        """Section summaries of a case grouped by category, in file then section order."""
+        processed_docs: Dict[str, List[dict]] = {}
+        query = (
+            "SELECT s.category, s.summary FROM sections s JOIN documents d ON d.id = s.document_id"
+            " WHERE s.case_id = ? ORDER BY d.source_file, s.position"
+        )
+        for category, summary in self._stream(query, (case_id,)):
+            processed_docs.setdefault(category, []).append(json.loads(summary))
+        return processed_docs
+    
+    def iter_training_examples(self) -> Iterator[Tuple[str, str]]:
+        """Yield (section text, category) pairs categorized by the LLM in past runs."""
+        # Skip sections the local classifier decided, so it never trains on its own output;
+        # a document stored under several cases counts once
+        query = (
+            "SELECT text, category FROM sections"
+            " WHERE (category_source IS NULL OR category_source != 'local') AND text != ''"
+            " GROUP BY text, category ORDER BY MIN(processed_at)"
+        )
+        yield from self._stream(query, ())
+    
+    def count(self) -> int:
+        """Number of stored documents."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def import_json_outputs(self, json_output_dir: Path, text_output_dir: Optional[Path] = None, case_id: str = 'legacy') -> int:
+        """
+        Import the per-file JSON (and text) outputs of earlier versions, keeping their history.
+        
+        Imported documents have no pipeline version, so they are never resumed
+        from, but they are queried and used for training like any other.
+        """
+        def documents() -> Iterator[Tuple[dict, str]]:
+            for json_path in sorted(json_output_dir.glob("*.json")):
+                try:
+                    with open(json_path) as f:
+                        result = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if "source_file" not in result or "sections" not in result:
+                    continue
+                result.setdefault("file_hash", '')
+                text_path = text_output_dir / f"{json_path.stem}.txt" if text_output_dir else None
+                text = text_path.read_text() if text_path and text_path.exists() else ''
+                yield result, text
+        
+        count = self.put_documents(case_id, documents())
+        logger.info("Imported %d documents from %s", count, json_output_dir)
+        return count
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,34 +1,53 @@
 # document_processor/summarizer/document_summarizer.py
-import openai
 import json
+import logging
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from llm_client import LLMClient, get_default_client
+from ..categorizer.schema_registry import NULL_REQUIRED, get_path, get_registry, set_path
 from ..models.document import DocumentSection
 
+logger = logging.getLogger(__name__)
+
 class DocumentSummarizer:
     """Extracts structured data from document sections based on their category schema."""
     
-    def __init__(self, api_key: str, schema_dir: Path):
-        """Initialize with OpenAI API key and schema directory."""
-        self.client = openai.OpenAI(api_key=api_key)
-        self.schemas = self._load_schemas(schema_dir)
+    # Bump when the extraction prompt changes so cached summaries are invalidated
+    version: str = "2"
     
-    def _load_schemas(self, schema_dir: Path) -> dict:
-        schemas = {}
-        for schema_file in schema_dir.glob("*.json"):
-            with open(schema_file) as f:
-                schemas[schema_file.stem] = json.load(f)
-        return schemas
+    def __init__(
+        self,
+        api_key: str,
+        schema_dir: Path,
+        llm: Optional[LLMClient] = None,
+        repair: bool = True,
+        max_repair_fields: int = 20
+    ):
+        """
+        Initialize with OpenAI API key and schema directory.
+        
+        Args:
+            api_key: OpenAI API key
+            schema_dir: Directory containing category schemas
+            llm: Shared LLM client (default: the process-wide client for api_key)
+            repair: Re-request only the fields that fail schema validation
+            max_repair_fields: Most invalid fields sent in one repair request
+        """
+        self.llm = llm or get_default_client(api_key)
+        self.registry = get_registry(schema_dir)
+        self.schemas = self.registry.schemas
+        self.schema_versions = self.registry.versions
+        self.repair = repair
+        self.max_repair_fields = max_repair_fields
     
-    def summarize_section(self, section: DocumentSection) -> dict:
-        """Extract structured data from a document section based on its category schema."""
+    def _build_request(self, section: DocumentSection) -> dict:
+        """Build the summarize_section request kwargs for a categorized section."""
         if not section.category or section.category not in self.schemas:
             raise ValueError(f"Invalid category: {section.category}")
         
-        schema = self.schemas[section.category]
-        
         prompt = f"""
         Extract structured information from this document according to the following JSON schema:
-        {json.dumps(schema, indent=2)}
+        {self.registry.prompt_strings[section.category]}
         
         Document content:
         {section.content}
@@ -37,25 +56,212 @@ class DocumentSummarizer:
         """
         
         messages = [{"role": "user", "content": prompt}]
-        print("\nSending to OpenAI (summarize_section):")
-        print("Messages:", json.dumps(messages, indent=2))
-        print("Schema:", json.dumps(schema, indent=2))
-        
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=messages
-        )
-        print("\nOpenAI Response:")
-        print(json.dumps(response.model_dump(), indent=2))
-        
-        # Parse and validate against schema
+        
+        return {
+            "model": "gpt-4",
+            "messages": messages,
+            "temperature": 0
+        }
+    
+    def _parse_response(self, response) -> dict:
+        """Parse the structured data out of a summarize_section response."""
         try:
             result = json.loads(response.choices[0].message.content)
-            print("\nParsed Result:")
-            print(json.dumps(result, indent=2))
         except json.JSONDecodeError as e:
-            print(f"\nError parsing JSON response: {e}")
-            result = {"error": "Failed to parse response"}
-        
-        # TODO: Add proper JSON schema validation
+            logger.warning("Error parsing JSON response: %s", e)
+            return {"error": "Failed to parse response"}
+        if not isinstance(result, dict):
+            logger.warning("Expected a JSON object, got %s", type(result).__name__)
+            return {"error": "Failed to parse response"}
         return result
+    
+    def _repairable_errors(self, category: str, data: dict) -> List[Tuple[str, str]]:
+        """Validate data and return the field errors a repair request can address."""
+        errors = self.registry.validate(category, data)
+        if errors:
+            logger.info("%d schema violations in %s summary", len(errors), category)
+        # The root itself cannot be repaired field by field, and a null required field is
+        # the model saying the document does not state it, which a repair would only repeat
+        repairable = [(path, message) for path, message in errors if path and message != NULL_REQUIRED]
+        return repairable[:self.max_repair_fields] if self.repair else []
+    
+    def _build_repair_request(
+        self,
+        section: DocumentSection,
+        category: str,
+        data: dict,
+        errors: List[Tuple[str, str]]
+    ) -> dict:
+        """Build a request that re-extracts only the invalid fields of a summary."""
+        paths = list(dict.fromkeys(path for path, _ in errors))
+        problems = [
+            f"- {path}: {message} (current value: {json.dumps(get_path(data, path))})"
+            for path, message in errors
+        ]
+        
+        prompt = f"""
+        These fields extracted from the document below are invalid:
+        {chr(10).join(problems)}
+        
+        Return corrected values for exactly these fields, using null when the document
+        does not state a value.
+        
+        Document content:
+        {section.content}
+        """
+        
+        return {
+            "model": "gpt-4",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "field_repairs",
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            path: {"anyOf": [self.registry.field_schema(category, path), {"type": "null"}]}
+                            for path in paths
+                        },
+                        "required": paths
+                    }
+                }
+            }
+        }
+    
+    def _apply_repair(self, response, category: str, data: dict, errors: List[Tuple[str, str]]) -> dict:
+        """Merge repaired field values into data and log anything still invalid."""
+        try:
+            fixes: Dict[str, Any] = json.loads(response.choices[0].message.content)
+        except json.JSONDecodeError as e:
+            logger.warning("Error parsing repair response: %s", e)
+            return data
+        
+        for path, _ in errors:
+            if fixes.get(path) is not None:
+                set_path(data, path, fixes[path])
+        
+        remaining = self.registry.validate(category, data)
+        if remaining:
+            logger.warning("%d schema violations remain in %s summary after repair", len(remaining), category)
+        return data
+    
+    def _validated(self, section: DocumentSection, category: str, data: dict) -> dict:
+        """Validate a summary locally, repairing only the invalid fields."""
+        errors = self._repairable_errors(category, data)
+        if not errors:
+            return data
+        response = self.llm.create(stage='repair', **self._build_repair_request(section, category, data, errors))
+        return self._apply_repair(response, category, data, errors)
+    
+    async def _validated_async(self, section: DocumentSection, category: str, data: dict) -> dict:
+        """Async variant of _validated."""
+        errors = self._repairable_errors(category, data)
+        if not errors:
+            return data
+        response = await self.llm.acreate(stage='repair', **self._build_repair_request(section, category, data, errors))
+        return self._apply_repair(response, category, data, errors)
+    
+    def summarize_section(self, section: DocumentSection) -> dict:
+        """Extract structured data from a document section based on its category schema."""
+        response = self.llm.create(stage='summarization', **self._build_request(section))
+        result = self._parse_response(response)
+        if 'error' in result:
+            return result
+        return self._validated(section, section.category, result)
+    
+    async def summarize_section_async(self, section: DocumentSection) -> dict:
+        """Async variant of summarize_section."""
+        response = await self.llm.acreate(stage='summarization', **self._build_request(section))
+        result = self._parse_response(response)
+        if 'error' in result:
+            return result
+        return await self._validated_async(section, section.category, result)
+    
+    def _build_combined_request(self, section: DocumentSection) -> dict:
+        """Build a single request that both classifies a section and extracts its schema fields."""
+        # Discriminated union: each variant pins "category" to one schema name and
+        # constrains "data" to that category's schema
+        variants = []
+        for name, data_schema in self.registry.prompt_schemas.items():
+            variants.append({
+                "type": "object",
+                "properties": {
+                    "category": {"type": "string", "enum": [name]},
+                    "data": data_schema
+                },
+                "required": ["category", "data"]
+            })
+        
+        prompt = f"""
+        Determine which category this document belongs to, then extract structured
+        information from it according to that category's JSON schema.
+        
+        Available categories (use EXACTLY one of these names):
+        {', '.join(self.schemas.keys())}
+        
+        Document content:
+        {section.content}
+        
+        Return a JSON object of the form {{"document": {{"category": ..., "data": ...}}}}.
+        """
+        
+        messages = [{"role": "user", "content": prompt}]
+        
+        return {
+            "model": "gpt-4",
+            "messages": messages,
+            "temperature": 0,
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "categorized_document",
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "document": {"anyOf": variants}
+                        },
+                        "required": ["document"]
+                    }
+                }
+            }
+        }
+    
+    def _parse_combined_response(self, response) -> Optional[Tuple[str, dict]]:
+        """Parse (category, data) from a combined response, or None if it is unusable."""
+        try:
+            document = json.loads(response.choices[0].message.content)["document"]
+            category = document["category"].strip().lower()
+            data = document["data"]
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("Error parsing combined response: %s", e)
+            return None
+        
+        if category not in self.schemas or not isinstance(data, dict):
+            logger.warning("Unexpected category or data in combined response: %s", category)
+            return None
+        return category, data
+    
+    def categorize_and_summarize(self, section: DocumentSection) -> Optional[Tuple[str, dict]]:
+        """
+        Classify a section and extract its schema fields in one request.
+        
+        Returns:
+            (category, structured data), or None if the response could not be used
+        """
+        response = self.llm.create(stage='categorize_and_summarize', **self._build_combined_request(section))
+        combined = self._parse_combined_response(response)
+        if combined is None:
+            return None
+        category, data = combined
+        return category, self._validated(section, category, data)
+    
+    async def categorize_and_summarize_async(self, section: DocumentSection) -> Optional[Tuple[str, dict]]:
+        """Async variant of categorize_and_summarize."""
+        response = await self.llm.acreate(stage='categorize_and_summarize', **self._build_combined_request(section))
+        combined = self._parse_combined_response(response)
+        if combined is None:
+            return None
+        category, data = combined
+        return category, await self._validated_async(section, category, data)
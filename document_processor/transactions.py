@@ -0,0 +1,293 @@
+# document_processor/transactions.py
+from array import array
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# datetime64 "not a time" as an int64 day count
+NAT_DAYS = np.iinfo(np.int64).min
+
+class _Encoder:
+    """Dictionary-encodes strings to int32 codes while records are read."""
+    
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+    
+    def encode(self, value: Any) -> int:
+        label = '' if value is None else str(value)
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+def _parse_amount(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def _parse_day(value: Any, cache: Dict[Any, int]) -> int:
+    """Days since the epoch of an ISO string or extended JSON date; NAT_DAYS if unparseable."""
+    if isinstance(value, dict):
+        value = value.get('$date')
+        if isinstance(value, dict):
+            value = value.get('$numberLong')
+    if isinstance(value, str) and value.lstrip('-').isdigit():
+        value = int(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Extended JSON timestamps are in milliseconds
+        return int(value // 86_400_000)
+    if not isinstance(value, str):
+        return NAT_DAYS
+    # Only the day matters, and transaction dates repeat a lot
+    key = value[:10]
+    days = cache.get(key)
+    if days is None:
+        try:
+            days = date.fromisoformat(key).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            days = NAT_DAYS
+        cache[key] = days
+    return days
+
+class TransactionTable:
+    """
+    Columnar, NumPy-backed transaction store.
+    
+    Amounts are float64 (NaN when missing), dates datetime64[D] (NaT when
+    missing), and types, currencies and counterparties are dictionary-encoded
+    as int32 codes into label lists. Aggregations run on whole columns, so
+    they stay fast on millions of rows; amounts are never summed or ranked
+    across currencies.
+    """
+    
+    def __init__(
+        self,
+        amounts: np.ndarray,
+        dates: np.ndarray,
+        types: Tuple[np.ndarray, List[str]],
+        currencies: Tuple[np.ndarray, List[str]],
+        counterparties: Tuple[np.ndarray, List[str]]
+    ):
+        """
+        Initialize from columns; every code array has one entry per row.
+        
+        Args:
+            amounts: float64 amounts
+            dates: datetime64[D] dates
+            types: (codes, labels) of the transaction types
+            currencies: (codes, labels) of the currencies
+            counterparties: (codes, labels) of the counterparties
+        """
+        self.amounts = amounts
+        self.dates = dates
+        self.type_codes, self.type_labels = types
+        self.currency_codes, self.currency_labels = currencies
+        self.counterparty_codes, self.counterparty_labels = counterparties
+    
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'TransactionTable':
+        """Build a table from raw transaction records in a single pass."""
+        amounts = array('d')
+        days = array('q')
+        type_codes, currency_codes, counterparty_codes = array('i'), array('i'), array('i')
+        types, currencies, counterparties = _Encoder(), _Encoder(), _Encoder()
+        day_cache: Dict[Any, int] = {}
+        
+        for record in records:
+            amounts.append(_parse_amount(record.get('amount')))
+            days.append(_parse_day(record.get('date'), day_cache))
+            type_codes.append(types.encode(record.get('type')))
+            currency_codes.append(currencies.encode(record.get('currency')))
+            counterparty_codes.append(counterparties.encode(record.get('counterparty')))
+        
+        return cls(
+            np.frombuffer(amounts, dtype=np.float64),
+            np.frombuffer(days, dtype=np.int64).view('datetime64[D]'),
+            (np.frombuffer(type_codes, dtype=np.int32), types.labels),
+            (np.frombuffer(currency_codes, dtype=np.int32), currencies.labels),
+            (np.frombuffer(counterparty_codes, dtype=np.int32), counterparties.labels)
+        )
+    
+    @classmethod
+    def from_columns(
+        cls,
+        amounts: Sequence[float],
+        dates: Sequence[Any],
+        types: Sequence[str],
+        currencies: Sequence[str],
+        counterparties: Sequence[str]
+    ) -> 'TransactionTable':
+        """Build a table from equal-length column sequences, encoding them vectorized."""
+        def encode(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+            labels, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            return codes.astype(np.int32), labels.tolist()
+        
+        return cls(
+            np.asarray(amounts, dtype=np.float64),
+            np.asarray(dates, dtype='datetime64[D]'),
+            encode(types),
+            encode(currencies),
+            encode(counterparties)
+        )
+    
+    def __len__(self) -> int:
+        return len(self.amounts)
+    
+    def filter(self, mask: np.ndarray) -> 'TransactionTable':
+        """Rows where mask is true, sharing this table's label lists."""
+        return TransactionTable(
+            self.amounts[mask],
+            self.dates[mask],
+            (self.type_codes[mask], self.type_labels),
+            (self.currency_codes[mask], self.currency_labels),
+            (self.counterparty_codes[mask], self.counterparty_labels)
+        )
+    
+    def in_currency(self, currency: str) -> 'TransactionTable':
+        """Rows in one currency."""
+        if currency not in self.currency_labels:
+            return self.filter(np.zeros(len(self), dtype=bool))
+        return self.filter(self.currency_codes == self.currency_labels.index(currency))
+    
+    def _group(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(unique keys, row counts, amount totals) per key, over rows with an amount."""
+        valid = ~np.isnan(self.amounts)
+        keys, amounts = keys[valid], self.amounts[valid]
+        if not len(keys):
+            return keys, np.zeros(0, dtype=np.int64), np.zeros(0)
+        low = keys.min()
+        if keys.max() - low < 4 * len(keys):
+            # Dense keys (codes, months): count straight into slots, no sort
+            offsets = keys - low
+            counts = np.bincount(offsets)
+            totals = np.bincount(offsets, weights=amounts)
+            present = np.flatnonzero(counts)
+            return present + low, counts[present], totals[present]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        totals = np.bincount(inverse, weights=amounts, minlength=len(unique))
+        return unique, counts, totals
+    
+    def _by_currency_and(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Group by (codes, currency); returns (codes, currency codes, counts, totals)."""
+        currency_count = max(len(self.currency_labels), 1)
+        keys = codes.astype(np.int64) * currency_count + self.currency_codes
+        unique, counts, totals = self._group(keys)
+        return unique // currency_count, unique % currency_count, counts, totals
+    
+    def volume_by_currency(self) -> List[Dict[str, Any]]:
+        """Count, total and mean amount per currency, largest total first."""
+        currencies, counts, totals = self._group(self.currency_codes)
+        rows = [
+            {
+                "currency": self.currency_labels[currency],
+                "count": int(count),
+                "total": float(total),
+                "mean": float(total / count)
+            }
+            for currency, count, total in zip(currencies, counts, totals)
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+    
+    def volume_by_counterparty(self, top_n: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Count and total per counterparty, by currency; the top_n largest totals of each currency first."""
+        counterparties, currencies, counts, totals = self._by_currency_and(self.counterparty_codes)
+        result = {}
+        for code, currency in enumerate(self.currency_labels):
+            rows = np.flatnonzero(currencies == code)
+            if not len(rows):
+                continue
+            order = rows[np.argsort(-totals[rows], kind='stable')][:top_n]
+            result[currency] = [
+                {
+                    "counterparty": self.counterparty_labels[counterparties[i]],
+                    "count": int(counts[i]),
+                    "total": float(totals[i])
+                }
+                for i in order
+            ]
+        return result
+    
+    def volume_by_type(self) -> List[Dict[str, Any]]:
+        """Count and total per (transaction type, currency), largest total first."""
+        types, currencies, counts, totals = self._by_currency_and(self.type_codes)
+        rows = [
+            {
+                "type": self.type_labels[type_code],
+                "currency": self.currency_labels[currency],
+                "count": int(count),
+                "total": float(total)
+            }
+            for type_code, currency, count, total in zip(types, currencies, counts, totals)
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+    
+    def volume_by_month(self) -> List[Dict[str, Any]]:
+        """Count and total per (month, currency), in date order; undated rows are skipped."""
+        dated = self.filter(~np.isnat(self.dates))
+        months = dated.dates.astype('datetime64[M]').astype(np.int64)
+        month_codes, currencies, counts, totals = dated._by_currency_and(months)
+        return [
+            {
+                "month": str(np.datetime64(int(month), 'M')),
+                "currency": dated.currency_labels[currency],
+                "count": int(count),
+                "total": float(total)
+            }
+            for month, currency, count, total in zip(month_codes, currencies, counts, totals)
+        ]
+    
+    def top(self, n: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """The n largest transactions of each currency by amount, largest first."""
+        valid = ~np.isnan(self.amounts)
+        result = {}
+        for code, currency in enumerate(self.currency_labels):
+            rows = np.flatnonzero(valid & (self.currency_codes == code))
+            k = min(n, len(rows))
+            if k <= 0:
+                continue
+            amounts = self.amounts[rows]
+            # Partial selection is O(rows); only the k winners are sorted
+            candidates = np.argpartition(-amounts, k - 1)[:k]
+            result[currency] = [self.row(i) for i in rows[candidates[np.argsort(-amounts[candidates], kind='stable')]]]
+        return result
+    
+    def percentiles(self, quantiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Dict[str, float]]:
+        """Amount percentiles per currency."""
+        result = {}
+        for code, currency in enumerate(self.currency_labels):
+            amounts = self.amounts[(self.currency_codes == code) & ~np.isnan(self.amounts)]
+            if len(amounts):
+                values = np.percentile(amounts, quantiles)
+                result[currency] = {f"p{q:g}": float(value) for q, value in zip(quantiles, values)}
+        return result
+    
+    def row(self, i: int) -> Dict[str, Any]:
+        """A single transaction as a record like the ones it was loaded from."""
+        day = self.dates[i]
+        return {
+            "type": self.type_labels[self.type_codes[i]],
+            "amount": float(self.amounts[i]),
+            "currency": self.currency_labels[self.currency_codes[i]],
+            "date": None if np.isnat(day) else str(day),
+            "counterparty": self.counterparty_labels[self.counterparty_codes[i]]
+        }
+    
+    def summary(self, top_n: int = 10) -> Dict[str, Any]:
+        """Aggregates that describe the transactions for a report, instead of the raw rows."""
+        dated = self.dates[~np.isnat(self.dates)]
+        return {
+            "count": len(self),
+            "first_date": str(dated.min()) if len(dated) else None,
+            "last_date": str(dated.max()) if len(dated) else None,
+            "by_currency": self.volume_by_currency(),
+            "percentiles": self.percentiles(),
+            "by_type": self.volume_by_type(),
+            "by_month": self.volume_by_month(),
+            "top_counterparties": self.volume_by_counterparty(top_n),
+            "largest": self.top(top_n)
+        }
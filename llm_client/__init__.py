@@ -0,0 +1,10 @@
+from .client import LLMClient, get_default_client
+from .metrics import CallRecord, MetricsCollector, tag
+from .response_cache import ResponseCache
+from .tokens import count_tokens
+from .tracing import Tracer, configure_tracing, span
+
+__all__ = [
+    'CallRecord', 'LLMClient', 'MetricsCollector', 'ResponseCache', 'Tracer',
+    'configure_tracing', 'count_tokens', 'get_default_client', 'span', 'tag'
+]
@@ -0,0 +1,286 @@
+# llm_client/client.py
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+from openai import (
+    APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
+)
+from openai.types.chat import ChatCompletion
+from .metrics import MetricsCollector
+from .response_cache import ResponseCache
+from .tracing import capture_payload, should_capture, span
+
+# Request parameters that change the completion and therefore belong in the cache key
+CACHE_KEY_PARAMS = (
+    'model', 'messages', 'response_format', 'temperature', 'top_p', 'max_tokens',
+    'n', 'stop', 'seed', 'presence_penalty', 'frequency_penalty', 'tools', 'tool_choice'
+)
+
+DEFAULT_CACHE_PATH = Path.home() / '.cache' / 'complianceai' / 'llm_responses.sqlite3'
+
+# Transient failures worth retrying; anything else is raised immediately
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+class LLMClient:
+    """
+    Chat completions client shared by every OpenAI caller in the pipeline.
+    
+    Responses are memoized in a ResponseCache keyed on a canonical hash of the
+    request. Deterministic requests (temperature 0) are cached by default; any
+    call can opt in or out with ``cache=True``/``cache=False``, and the whole
+    cache can be bypassed with ``cache_enabled=False`` or the
+    ``LLM_CACHE_DISABLED`` environment variable.
+    
+    Every call, cached or not, is recorded in ``metrics`` with its latency,
+    token usage and retries, tagged with the pipeline stage, file and section.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_enabled: Optional[bool] = None,
+        max_retries: int = 2,
+        retry_base_delay: float = 1.0,
+        metrics: Optional[MetricsCollector] = None
+    ):
+        # Retries are done here rather than inside the SDK so they can be counted
+        self.client = OpenAI(api_key=api_key or None, max_retries=0)
+        self.async_client = AsyncOpenAI(api_key=api_key or None, max_retries=0)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.metrics = metrics or MetricsCollector()
+        if cache_enabled is None:
+            cache_enabled = os.getenv('LLM_CACHE_DISABLED', '').lower() not in ('1', 'true', 'yes')
+        self.cache_enabled = cache_enabled
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._stats_lock = threading.Lock()
+    
+    @staticmethod
+    def cache_key(params: Dict[str, Any]) -> str:
+        """Return a canonical hash of the parameters that determine a completion."""
+        relevant = {name: params[name] for name in CACHE_KEY_PARAMS if name in params}
+        canonical = json.dumps(relevant, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def _use_cache(self, params: Dict[str, Any], cache: Optional[bool]) -> bool:
+        if not self.cache_enabled or self.cache is None:
+            return False
+        if cache is not None:
+            return cache
+        # The API samples at temperature 1 unless told otherwise
+        return params.get('temperature', 1) == 0
+    
+    def _count(self, outcome: str) -> None:
+        with self._stats_lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+    
+    def _lookup(self, params: Dict[str, Any], cache: Optional[bool]) -> tuple:
+        """Return (cache key or None, cached completion or None) for a request."""
+        if not self._use_cache(params, cache):
+            self._count('bypassed')
+            return None, None
+        key = self.cache_key(params)
+        cached = self.cache.get(key)
+        if cached is None:
+            self._count('misses')
+            return key, None
+        self._count('hits')
+        return key, ChatCompletion.model_validate(cached)
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter before retry number attempt (1-based)."""
+        return self.retry_base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
+    
+    def _span_attrs(self, params: Dict[str, Any], stage: Optional[str]) -> Dict[str, Any]:
+        # Only override the stage tag when the caller names one
+        attrs = {"model": params.get('model')}
+        if stage:
+            attrs["stage"] = stage
+        return attrs
+    
+    def _begin(self, params: Dict[str, Any], cache: Optional[bool], stage: Optional[str]) -> tuple:
+        """Start the metrics record and cache lookup; returns (record, key, cached, sampled)."""
+        record = self.metrics.start(params.get('model', ''), stage)
+        sampled = should_capture()
+        if sampled:
+            capture_payload('request', params)
+        key, cached = self._lookup(params, cache)
+        if cached is not None:
+            record.cache_hit = True
+            self.metrics.finish(record, cached)
+            if sampled:
+                capture_payload('response', cached.model_dump())
+        return record, key, cached, sampled
+    
+    def _complete(self, record, key: Optional[str], response: ChatCompletion, sampled: bool) -> None:
+        self.metrics.finish(record, response)
+        if sampled:
+            capture_payload('response', response.model_dump())
+        if key is not None:
+            self.cache.put(key, response.model_dump())
+    
+    def create(self, cache: Optional[bool] = None, stage: Optional[str] = None, **params) -> ChatCompletion:
+        """
+        Create a chat completion, served from the cache when possible.
+        
+        Args:
+            cache: Force caching on or off for this call (default: cache deterministic requests)
+            stage: Pipeline stage the call is recorded under (default: the tagged stage)
+            **params: Chat completion parameters
+        """
+        with span('llm_call', **self._span_attrs(params, stage)):
+            return self._create(cache, stage, params)
+    
+    def _create(self, cache: Optional[bool], stage: Optional[str], params: Dict[str, Any]) -> ChatCompletion:
+        record, key, cached, sampled = self._begin(params, cache, stage)
+        if cached is not None:
+            return cached
+        
+        while True:
+            try:
+                response = self.client.chat.completions.create(**params)
+                break
+            except RETRYABLE_ERRORS as e:
+                if record.retries >= self.max_retries:
+                    self.metrics.finish(record, error=e)
+                    raise
+                record.retries += 1
+                time.sleep(self._retry_delay(record.retries))
+            except Exception as e:
+                self.metrics.finish(record, error=e)
+                raise
+        
+        self._complete(record, key, response, sampled)
+        return response
+    
+    async def acreate(self, cache: Optional[bool] = None, stage: Optional[str] = None, **params) -> ChatCompletion:
+        """Async variant of create."""
+        with span('llm_call', **self._span_attrs(params, stage)):
+            return await self._acreate(cache, stage, params)
+    
+    async def _acreate(self, cache: Optional[bool], stage: Optional[str], params: Dict[str, Any]) -> ChatCompletion:
+        record, key, cached, sampled = self._begin(params, cache, stage)
+        if cached is not None:
+            return cached
+        
+        while True:
+            try:
+                response = await self.async_client.chat.completions.create(**params)
+                break
+            except RETRYABLE_ERRORS as e:
+                if record.retries >= self.max_retries:
+                    self.metrics.finish(record, error=e)
+                    raise
+                record.retries += 1
+                await asyncio.sleep(self._retry_delay(record.retries))
+            except Exception as e:
+                self.metrics.finish(record, error=e)
+                raise
+        
+        self._complete(record, key, response, sampled)
+        return response
+    
+    async def astream(self, cache: Optional[bool] = None, stage: Optional[str] = None, **params) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content as it arrives.
+        
+        Takes the same arguments as create. A cached completion is yielded in one
+        piece. Retries only happen before the first chunk, since a retried stream
+        would repeat content already yielded. The content is only kept in memory
+        when it has to be cached or captured.
+        """
+        with span('llm_call', **self._span_attrs(params, stage)):
+            record, key, cached, sampled = self._begin(params, cache, stage)
+            if cached is not None:
+                yield cached.choices[0].message.content or ''
+                return
+            
+            params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+            while True:
+                try:
+                    stream = await self.async_client.chat.completions.create(**params)
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if record.retries >= self.max_retries:
+                        self.metrics.finish(record, error=e)
+                        raise
+                    record.retries += 1
+                    await asyncio.sleep(self._retry_delay(record.retries))
+                except Exception as e:
+                    self.metrics.finish(record, error=e)
+                    raise
+            
+            keep = key is not None or sampled
+            parts: List[str] = []
+            last = None
+            finish_reason = None
+            try:
+                async for chunk in stream:
+                    last = chunk
+                    # The final chunk only carries usage and has no choices
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        if keep:
+                            parts.append(content)
+                        yield content
+            except BaseException as e:
+                # Includes the consumer closing the stream early (GeneratorExit)
+                self.metrics.finish(record, error=e)
+                raise
+            
+            if not keep:
+                self.metrics.finish(record, last)
+                return
+            response = ChatCompletion.model_validate({
+                "id": last.id if last else '',
+                "object": "chat.completion",
+                "created": last.created if last else int(time.time()),
+                "model": last.model if last else params.get('model', ''),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": finish_reason or "stop",
+                    "message": {"role": "assistant", "content": ''.join(parts)}
+                }],
+                "usage": last.usage.model_dump() if last and last.usage else None
+            })
+            self._complete(record, key, response, sampled)
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Cache hit/miss counts and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_default_clients: Dict[str, LLMClient] = {}
+_default_lock = threading.Lock()
+
+def get_default_client(api_key: Optional[str] = None) -> LLMClient:
+    """
+    Return the process-wide client for an API key.
+    
+    Its cache lives at ``LLM_CACHE_PATH`` if set, otherwise under ~/.cache.
+    """
+    with _default_lock:
+        key = api_key or ''
+        if key not in _default_clients:
+            cache_path = Path(os.getenv('LLM_CACHE_PATH', str(DEFAULT_CACHE_PATH)))
+            _default_clients[key] = LLMClient(api_key, ResponseCache(cache_path))
+        return _default_clients[key]
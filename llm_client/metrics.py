@@ -0,0 +1,184 @@
+# llm_client/metrics.py
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# USD per million (prompt, completion) tokens, used for cost estimates only
+MODEL_PRICES: Dict[str, tuple] = {
+    'gpt-4': (30.0, 60.0),
+    'gpt-4-32k': (60.0, 120.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4-vision-preview': (10.0, 30.0),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4o-mini': (0.15, 0.6)
+}
+
+# Tags (stage, file, section) attached to every call made in the current context
+_tags: ContextVar[Dict[str, Any]] = ContextVar('llm_metric_tags', default={})
+# Seconds the current task waited for the concurrency slot it is running in
+_queue_wait: ContextVar[float] = ContextVar('llm_queue_wait', default=0.0)
+
+@contextmanager
+def tag(**tags: Any) -> Iterator[None]:
+    """Attach tags to every LLM call made inside the block, including nested tasks."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+def current_tags() -> Dict[str, Any]:
+    return dict(_tags.get())
+
+@contextmanager
+def queue_wait(seconds: float) -> Iterator[None]:
+    """Record how long the surrounding work waited before it was allowed to run."""
+    token = _queue_wait.set(seconds)
+    try:
+        yield
+    finally:
+        _queue_wait.reset(token)
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of a call, or None for models without a known price."""
+    # Dated snapshots (e.g. gpt-4-0613) are priced like their base model
+    base = max((name for name in MODEL_PRICES if model.startswith(name)), key=len, default=None)
+    if base is None:
+        return None
+    prompt_price, completion_price = MODEL_PRICES[base]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+@dataclass
+class CallRecord:
+    """Metrics of a single chat completion call."""
+    model: str
+    stage: Optional[str] = None
+    file: Optional[str] = None
+    section: Optional[Any] = None
+    started_at: float = field(default_factory=time.time)
+    latency: float = 0.0  # Wall time of the call, including retries
+    queue_wait: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+    
+    @property
+    def cost(self) -> Optional[float]:
+        if self.cache_hit:
+            return 0.0
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens)
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class MetricsCollector:
+    """Collects a CallRecord per LLM call and aggregates them per stage and per file."""
+    
+    def __init__(self):
+        self.records: List[CallRecord] = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+    
+    def start(self, model: str, stage: Optional[str] = None) -> CallRecord:
+        """Create a record for a call about to be made, tagged from the current context."""
+        tags = current_tags()
+        return CallRecord(
+            model=model,
+            stage=stage or tags.get('stage'),
+            file=tags.get('file'),
+            section=tags.get('section'),
+            queue_wait=_queue_wait.get()
+        )
+    
+    def finish(self, record: CallRecord, response: Any = None, error: Optional[BaseException] = None) -> None:
+        """Complete a record from the response usage (or the error) and store it."""
+        record.latency = time.time() - record.started_at
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            record.prompt_tokens = usage.prompt_tokens or 0
+            record.completion_tokens = usage.completion_tokens or 0
+            details = getattr(usage, 'prompt_tokens_details', None)
+            record.cached_tokens = getattr(details, 'cached_tokens', None) or 0
+        if error is not None:
+            record.error = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.records.append(record)
+    
+    def _aggregate(self, records: List[CallRecord]) -> Dict[str, Any]:
+        billed = [record for record in records if not record.cache_hit]
+        latencies = [record.latency for record in billed]
+        costs = [record.cost for record in billed]
+        return {
+            "calls": len(records),
+            "cache_hits": len(records) - len(billed),
+            "errors": sum(1 for record in records if record.error),
+            "retries": sum(record.retries for record in records),
+            "latency_total": sum(latencies),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95": _percentile(latencies, 0.95),
+            "queue_wait_total": sum(record.queue_wait for record in records),
+            "prompt_tokens": sum(record.prompt_tokens for record in billed),
+            "completion_tokens": sum(record.completion_tokens for record in billed),
+            "cached_tokens": sum(record.cached_tokens for record in billed),
+            "cost_usd": sum(cost for cost in costs if cost is not None),
+            "unpriced_calls": sum(1 for cost in costs if cost is None)
+        }
+    
+    def _group(self, key: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            records = list(self.records)
+        groups: Dict[str, List[CallRecord]] = {}
+        for record in records:
+            groups.setdefault(str(getattr(record, key) or 'untagged'), []).append(record)
+        return {name: self._aggregate(group) for name, group in sorted(groups.items())}
+    
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregated metrics per stage."""
+        return self._group('stage')
+    
+    def by_file(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregated metrics per input file, to find the expensive documents."""
+        return self._group('file')
+    
+    def print_summary(self) -> None:
+        """Print a per-stage table of calls, latency, tokens and cost."""
+        print("\nLLM calls by stage:")
+        print(f"{'stage':<24}{'calls':>7}{'hits':>7}{'errors':>8}{'p95 s':>9}{'prompt':>10}{'compl.':>9}{'cost $':>10}")
+        for stage, totals in self.summary().items():
+            print(
+                f"{stage:<24}{totals['calls']:>7}{totals['cache_hits']:>7}{totals['errors']:>8}"
+                f"{totals['latency_p95']:>9.2f}{totals['prompt_tokens']:>10}"
+                f"{totals['completion_tokens']:>9}{totals['cost_usd']:>10.4f}"
+            )
+    
+    def write_report(self, path: Path) -> Path:
+        """Write a machine-readable run report with totals, per-stage, per-file and per-call metrics."""
+        with self._lock:
+            records = list(self.records)
+        report = {
+            "started_at": self.started_at,
+            "finished_at": time.time(),
+            "totals": self._aggregate(records),
+            "stages": self.summary(),
+            "files": self.by_file(),
+            "calls": [{**asdict(record), "cost_usd": record.cost} for record in records]
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=str)
+        logger.info("Saved run report to: %s", path)
+        return path
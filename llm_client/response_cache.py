@@ -0,0 +1,140 @@
+# llm_client/response_cache.py
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+class ResponseCache:
+    """
+    On-disk store for LLM responses, backed by a single SQLite file.
+    
+    Entries expire after ``ttl_seconds`` and the least recently used entries are
+    evicted once the store holds more than ``max_entries`` entries or
+    ``max_bytes`` bytes of responses. Entry count and size are kept as running
+    totals, so a put does not scan the table; expired entries are purged, and
+    the totals resynchronized, every ``maintenance_interval`` puts.
+    """
+    
+    def __init__(
+        self,
+        db_path: Path,
+        ttl_seconds: Optional[float] = 30 * 24 * 3600,
+        max_entries: int = 100_000,
+        max_bytes: int = 1024 * 1024 * 1024,
+        maintenance_interval: int = 1000
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            db_path: SQLite database file, created if missing
+            ttl_seconds: Lifetime of an entry, or None for no expiry
+            max_entries: Maximum number of stored responses
+            max_bytes: Maximum total size of stored responses
+            maintenance_interval: Puts between purges of expired entries
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.maintenance_interval = maintenance_interval
+        self._puts = 0
+        self._lock = threading.Lock()
+        
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._count, self._total = self._totals()
+    
+    def _totals(self) -> Tuple[int, int]:
+        return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    
+    def get(self, key: str) -> Optional[dict]:
+        """Return the stored response for a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at, size = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+                self._total -= size
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(response)
+    
+    def put(self, key: str, response: dict) -> None:
+        """Store a response under a key and evict old entries if over the limits."""
+        payload = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            if previous:
+                self._total += len(payload) - previous[0]
+            else:
+                self._count += 1
+                self._total += len(payload)
+            
+            self._puts += 1
+            if self._puts >= self.maintenance_interval:
+                self._puts = 0
+                self._purge_expired()
+            if self._count > self.max_entries or self._total > self.max_bytes:
+                self._evict()
+    
+    def _purge_expired(self) -> None:
+        """Drop expired entries and resynchronize the running totals, e.g. with other processes."""
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._count, self._total = self._totals()
+    
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until within limits."""
+        self._purge_expired()
+        count, total = self._count, self._total
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        
+        # Evict down to a low-water mark so the next few puts don't trigger another scan
+        target_entries = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if count <= target_entries and total <= target_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._count, self._total = count, total
+    
+    def clear(self) -> None:
+        """Remove every stored response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._count = self._total = 0
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
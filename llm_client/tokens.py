@@ -0,0 +1,30 @@
+# llm_client/tokens.py
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to an estimate
+    tiktoken = None
+
+# Average characters per token for English prose with the GPT-4 tokenizer
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Optional["tiktoken.Encoding"]:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # The encoding files are downloaded on first use and may be unavailable offline
+        return None
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Count tokens in text for a model, or estimate them if tiktoken is unavailable."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
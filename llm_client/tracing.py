@@ -0,0 +1,198 @@
+# llm_client/tracing.py
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+from .metrics import tag
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Span:
+    """A timed unit of work (a file, a section, a stage call) in the trace tree."""
+    name: str
+    attrs: Dict[str, Any]
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('trace_span', default=None)
+
+class Tracer:
+    """
+    Writes span and payload events to a JSONL trace file from a background thread.
+    
+    Callers only enqueue events, so serialization and disk I/O stay off the hot
+    path; when the queue is full events are dropped and counted rather than
+    blocking. Payload capture is off unless enabled, and captured payloads are
+    sampled per call and truncated.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        capture_payloads: bool = False,
+        sample_rate: float = 1.0,
+        max_chars: int = 2000,
+        queue_size: int = 10000
+    ):
+        """
+        Initialize the tracer and start its writer thread.
+        
+        Args:
+            path: JSONL file events are appended to
+            capture_payloads: Record request and response payloads, not just spans
+            sample_rate: Fraction of calls whose payloads are captured
+            max_chars: Strings in captured payloads are truncated to this length
+            queue_size: Events buffered for the writer before new ones are dropped
+        """
+        self.path = path
+        self.capture_payloads = capture_payloads
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        with open(self.path, 'a') as f:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    break
+                f.write(json.dumps(event, default=str) + '\n')
+                # Flush once the backlog is written rather than after every event
+                if self._queue.empty():
+                    f.flush()
+    
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Queue an event for writing without blocking."""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+    
+    def should_capture(self) -> bool:
+        """Decide once per call whether its payloads are captured."""
+        return self.capture_payloads and random.random() < self.sample_rate
+    
+    def truncate(self, value: Any) -> Any:
+        """Copy a payload with inline images elided and long strings cut to max_chars."""
+        if isinstance(value, dict):
+            return {key: self.truncate(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.truncate(item) for item in value]
+        if isinstance(value, str):
+            if value.startswith('data:') and ';base64,' in value[:64]:
+                return f"[inline image, {len(value)} chars]"
+            if len(value) > self.max_chars:
+                return value[:self.max_chars] + f"... [{len(value)} chars]"
+        return value
+    
+    def close(self) -> None:
+        """Write out queued events and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.dropped:
+            logger.warning("Dropped %d trace events", self.dropped)
+
+_tracer: Optional[Tracer] = None
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+def configure_tracing(
+    path: Optional[Path] = None,
+    capture_payloads: bool = False,
+    sample_rate: float = 1.0,
+    max_chars: int = 2000
+) -> Optional[Tracer]:
+    """
+    Install the process-wide tracer; without a path tracing is disabled.
+    
+    Defaults come from ``LLM_TRACE_PATH``, ``LLM_TRACE_PAYLOADS``,
+    ``LLM_TRACE_SAMPLE_RATE`` and ``LLM_TRACE_MAX_CHARS`` when set.
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+    
+    path = path or (Path(os.environ['LLM_TRACE_PATH']) if os.getenv('LLM_TRACE_PATH') else None)
+    if path is None:
+        return None
+    capture_payloads = capture_payloads or os.getenv('LLM_TRACE_PAYLOADS', '').lower() in ('1', 'true', 'yes')
+    sample_rate = float(os.getenv('LLM_TRACE_SAMPLE_RATE', sample_rate))
+    max_chars = int(os.getenv('LLM_TRACE_MAX_CHARS', max_chars))
+    
+    _tracer = Tracer(path, capture_payloads, sample_rate, max_chars)
+    atexit.register(_tracer.close)
+    logger.info("Tracing to %s (payloads %s)", path, "on" if capture_payloads else "off")
+    return _tracer
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Time a block as a child of the current span.
+    
+    The attributes are also applied as metric tags, so a span opened with
+    ``file=...`` or ``section=...`` tags every LLM call made inside it.
+    """
+    parent = _current_span.get()
+    current = Span(name, attrs, parent_id=parent.span_id if parent else None)
+    token = _current_span.set(current)
+    logger.debug("Started %s %s", name, attrs)
+    try:
+        with tag(**attrs):
+            yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        duration = time.time() - current.started_at
+        logger.debug("Finished %s in %.2fs", name, duration)
+        if _tracer is not None:
+            _tracer.emit({
+                "type": "span",
+                "name": name,
+                "span_id": current.span_id,
+                "parent_id": current.parent_id,
+                "started_at": current.started_at,
+                "duration": duration,
+                "attrs": attrs,
+                "error": current.error
+            })
+
+def capture_payload(kind: str, payload: Any) -> None:
+    """Record a request or response payload under the current span; call only for sampled calls."""
+    if _tracer is None:
+        return
+    current = _current_span.get()
+    _tracer.emit({
+        "type": kind,
+        "span_id": current.span_id if current else None,
+        "timestamp": time.time(),
+        "payload": _tracer.truncate(payload)
+    })
+
+def should_capture() -> bool:
+    """Whether the call about to be made should have its payloads captured."""
+    return _tracer is not None and _tracer.should_capture()
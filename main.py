@@ -1,15 +1,38 @@
+import argparse
 import os
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
+from llm_client import LLMClient, ResponseCache, configure_tracing
 from document_processor.processor import DocumentProcessor
+from report_generator.portfolio import PortfolioRunner
 from report_generator.report_processor import ReportProcessor
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate EDD reports for the companies in the backoffice data.")
+    parser.add_argument(
+        '--company', dest='company_ids', action='append', metavar='ID',
+        help="Company ID to report on; repeat for several (default: every company)"
+    )
+    parser.add_argument('--status', help="Only report on companies with this status")
+    parser.add_argument('--workers', type=int, default=4, help="Companies processed at the same time (default: 4)")
+    parser.add_argument('--stream', action='store_true', help="Write report sections to disk as they are generated")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main entry point."""
+    args = parse_args(argv)
+    
     # Load environment variables
     load_dotenv()
     api_key = os.getenv('OPENAI_API_KEY', '')
     
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    tracer = configure_tracing()
+    
     # Initialize paths
     base_dir = Path(__file__).parent
     data_dir = base_dir / 'data'
@@ -18,33 +41,35 @@ def main():
     output_dir = data_dir / 'output'
     
     try:
-        # Initialize processors
-        doc_processor = DocumentProcessor(api_key, data_dir, schema_dir)
-        report_processor = ReportProcessor(api_key, templates_dir, output_dir)
+        # One LLM client, and so one response cache, shared by every pipeline stage
+        llm = LLMClient(api_key, ResponseCache(data_dir / 'cache' / 'llm_responses.sqlite3'))
         
-        # Process documents
-        processed_docs = doc_processor.process_directory()
+        # Initialize processors
+        doc_processor = DocumentProcessor(api_key, data_dir, schema_dir, llm=llm)
+        report_processor = ReportProcessor(api_key, templates_dir, output_dir, llm)
         
-        # Generate report
-        sections = report_processor.generate_report(
-            processed_docs,
-            next(iter(doc_processor.data_loader.companies.values())) if doc_processor.data_loader.companies else {
-                "name": "INPLACE SOFTWARE MIDDLE EAST",
-                "legal_structure": "Limited Liability Company",
-                "incorporation_date": None,
-                "incorporation_place": "UAE",
-                "registration_number": None,
-                "address": None
-            },
-            list(doc_processor.data_loader.persons.values()),
-            doc_processor.data_loader.transactions
+        # Load the backoffice data once and report on every selected company
+        runner = PortfolioRunner(doc_processor, report_processor, output_dir, workers=args.workers, stream=args.stream)
+        result = runner.run(
+            args.company_ids,
+            (lambda company: company.status == args.status) if args.status else None
         )
         
-        return sections
+        # Refresh the local pre-classifier from this run's LLM categorizations
+        doc_processor.train_local_classifier()
+        
+        logging.info("LLM cache: %s", llm.stats)
+        llm.metrics.print_summary()
+        llm.metrics.write_report(output_dir / 'run_report.json')
+        return result
         
     except Exception as e:
-        print(f"Error during processing: {e}")
+        logging.error("Error during processing: %s", e)
         raise
+    
+    finally:
+        if tracer:
+            tracer.close()
 
 if __name__ == "__main__":
     main()
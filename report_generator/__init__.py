@@ -1,31 +1,36 @@
 # report_generator/__init__.py
+import asyncio
 from pathlib import Path
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional
+from document_processor.concurrency import StageLimiter
+from llm_client import LLMClient, get_default_client
 from .sections import get_section_generator
-from .formatter import ReferenceManager, MarkdownFormatter
+from .formatter import ReferenceManager, MarkdownFormatter, MarkdownStream
 
 class ReportGenerator:
-    def __init__(self, api_key: str, templates_dir: Path):
+    def __init__(self, api_key: str, templates_dir: Path, llm: Optional[LLMClient] = None):
         """Initialize report generator with OpenAI API key and templates directory."""
         self.api_key = api_key
+        self.llm = llm or get_default_client(api_key)
         self.templates_dir = templates_dir
         self.reference_manager = ReferenceManager()
         self.formatter = MarkdownFormatter()
     
-    def generate_report(self, documents: Dict[str, List[dict]]) -> str:
-        """Generate complete EDD report from processed documents."""
-        # Generate each section
-        sections = []
+    async def agenerate_report(self, documents: Dict[str, List[dict]], limiter: Optional[StageLimiter] = None) -> str:
+        """Generate the complete EDD report, generating its sections concurrently."""
         section_types = ['business_description', 'ownership', 'compliance']
+        generators = [
+            get_section_generator(section_type, self.api_key, self.templates_dir, self.llm)
+            for section_type in section_types
+        ]
+        limiter = limiter or StageLimiter()
+        
+        async def generate(generator) -> str:
+            async with limiter.slot('report'):
+                return await generator.agenerate(documents)
         
-        for section_type in section_types:
-            generator = get_section_generator(
-                section_type,
-                self.api_key,
-                self.templates_dir
-            )
-            content = generator.generate(documents)
-            sections.append(content)
+        # gather keeps the section order fixed, whatever order they finish in
+        sections = await asyncio.gather(*(generate(generator) for generator in generators))
         
         # Combine sections
         combined_content = "\n\n".join(sections)
@@ -33,4 +38,54 @@ class ReportGenerator:
         # Process references and format
         formatted_content = self.reference_manager.process_text(combined_content)
         final_content = self.formatter.format(formatted_content)
-        return final_content
\ No newline at end of file
+        return final_content
+    
+    async def astream_report(
+        self,
+        documents: Dict[str, List[dict]],
+        limiter: Optional[StageLimiter] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the complete EDD report as formatted text while it is generated.
+        
+        Sections are generated concurrently but yielded in order: the first one
+        live, later ones as soon as those before them are done (buffering only
+        what they produced meanwhile). Text is formatted and its references
+        numbered line by line; the footnotes come last.
+        """
+        section_types = ['business_description', 'ownership', 'compliance']
+        generators = [
+            get_section_generator(section_type, self.api_key, self.templates_dir, self.llm)
+            for section_type in section_types
+        ]
+        limiter = limiter or StageLimiter()
+        queues: List[asyncio.Queue] = [asyncio.Queue() for _ in generators]
+        
+        async def produce(generator, queue: asyncio.Queue) -> None:
+            try:
+                async with limiter.slot('report'):
+                    async for chunk in generator.astream(documents):
+                        queue.put_nowait(chunk)
+            finally:
+                # End marker, also after a failure; awaiting the task re-raises it
+                queue.put_nowait(None)
+        
+        tasks = [asyncio.create_task(produce(generator, queue)) for generator, queue in zip(generators, queues)]
+        stream = MarkdownStream(self.formatter, self.reference_manager)
+        try:
+            for i, (task, queue) in enumerate(zip(tasks, queues)):
+                chunk = "\n\n" if i else await queue.get()
+                while chunk is not None:
+                    text = stream.feed(chunk)
+                    if text:
+                        yield text
+                    chunk = await queue.get()
+                await task
+            yield stream.close() + self.reference_manager.footnotes_text()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def generate_report(self, documents: Dict[str, List[dict]]) -> str:
+        """Generate complete EDD report from processed documents."""
+        return asyncio.run(self.agenerate_report(documents))
\ No newline at end of file
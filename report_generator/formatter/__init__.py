@@ -1,4 +1,4 @@
 from .reference_manager import ReferenceManager
-from .markdown_formatter import MarkdownFormatter
+from .markdown_formatter import MarkdownFormatter, MarkdownStream
 
-__all__ = ['ReferenceManager', 'MarkdownFormatter']
+__all__ = ['ReferenceManager', 'MarkdownFormatter', 'MarkdownStream']
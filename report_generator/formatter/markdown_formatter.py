@@ -1,23 +1,25 @@
 # report_generator/formatter/markdown_formatter.py
+from typing import List, Optional
+from .reference_manager import ReferenceManager
+
 class MarkdownFormatter:
     """Handles markdown formatting and cleanup."""
     
+    def format_line(self, line: str) -> str:
+        """Format a single line of markdown."""
+        # Fix header formatting
+        if line.strip().startswith('#'):
+            # Remove extra spaces after #
+            parts = line.split('#')
+            level = len(parts[0]) + 1
+            text = parts[-1].strip()
+            return f"{'#' * level} {text}"
+        return line
+    
     def format(self, content: str) -> str:
         """Format and clean up markdown content."""
         # Ensure consistent header formatting
-        lines = content.split('\n')
-        formatted_lines = []
-        
-        for line in lines:
-            # Fix header formatting
-            if line.strip().startswith('#'):
-                # Remove extra spaces after #
-                parts = line.split('#')
-                level = len(parts[0]) + 1
-                text = parts[-1].strip()
-                formatted_lines.append(f"{'#' * level} {text}")
-            else:
-                formatted_lines.append(line)
+        formatted_lines = [self.format_line(line) for line in content.split('\n')]
         
         # Ensure single blank line between sections
         content = '\n'.join(formatted_lines)
@@ -25,3 +27,48 @@ class MarkdownFormatter:
             content = content.replace('\n\n\n', '\n\n')
         
         return content
+
+class MarkdownStream:
+    """
+    Formats markdown that arrives in chunks, e.g. from a streamed completion.
+    
+    Text is buffered only until its line is complete; each complete line is
+    passed through the ReferenceManager and MarkdownFormatter and returned, so
+    output keeps pace with the input and memory does not grow with its length.
+    Joined, the output equals formatting the whole text at once.
+    """
+    
+    def __init__(self, formatter: Optional[MarkdownFormatter] = None, references: Optional[ReferenceManager] = None):
+        self.formatter = formatter or MarkdownFormatter()
+        self.references = references
+        self._partial = ''
+        self._newlines = 0
+        self._started = False
+    
+    def _emit(self, lines: List[str]) -> str:
+        output = []
+        for line in lines:
+            if self.references is not None:
+                line = self.references.replace_references(line)
+            line = self.formatter.format_line(line)
+            if self._started:
+                # Collapse runs of newlines to two, i.e. a single blank line
+                if self._newlines < 2:
+                    output.append('\n')
+                    self._newlines += 1
+            self._started = True
+            if line:
+                output.append(line)
+                self._newlines = 0
+        return ''.join(output)
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return the formatted text of the lines it completed."""
+        lines = (self._partial + chunk).split('\n')
+        self._partial = lines.pop()
+        return self._emit(lines)
+    
+    def close(self) -> str:
+        """Return the formatted text of the last, unterminated line."""
+        partial, self._partial = self._partial, ''
+        return self._emit([partial])
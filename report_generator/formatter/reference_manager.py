@@ -2,6 +2,9 @@
 import re
 from typing import Dict, List, Tuple
 
+# References never span lines, so text can be processed line by line
+REFERENCE_PATTERN = re.compile(r'\[ref:(.*?)\]')
+
 class ReferenceManager:
     """Manages document references and footnotes in the report."""
     
@@ -9,10 +12,10 @@ class ReferenceManager:
         self.references: Dict[str, int] = {}
         self.footnotes: List[Tuple[int, str]] = []
     
-    def process_text(self, text: str) -> str:
+    def replace_references(self, text: str) -> str:
         """
-        Processes text to standardize references and create footnotes.
-        Converts all document references to numbered footnotes.
+        Converts document references to numbered footnote markers.
+        References keep their numbers across calls, so text can be processed in pieces.
         """
         def replace_reference(match):
             doc_ref = match.group(1)
@@ -21,12 +24,22 @@ class ReferenceManager:
                 self.footnotes.append((self.references[doc_ref], doc_ref))
             return f"[^{self.references[doc_ref]}]"
         
-        # Replace all document references with footnote numbers
-        processed_text = re.sub(r'\[ref:(.*?)\]', replace_reference, text)
-        
-        # Add footnotes section
+        return REFERENCE_PATTERN.sub(replace_reference, text)
+    
+    def footnotes_text(self) -> str:
+        """Returns the footnotes section for every reference seen so far."""
         footnotes_text = "\n\n## Footnotes\n\n"
         for number, reference in sorted(self.footnotes):
             footnotes_text += f"[^{number}]: {reference}\n"
+        return footnotes_text
+    
+    def process_text(self, text: str) -> str:
+        """
+        Processes text to standardize references and create footnotes.
+        Converts all document references to numbered footnotes.
+        """
+        # Replace all document references with footnote numbers
+        processed_text = self.replace_references(text)
         
-        return processed_text + footnotes_text
\ No newline at end of file
+        # Add footnotes section
+        return processed_text + self.footnotes_text()
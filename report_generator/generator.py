@@ -1,50 +1,90 @@
+import asyncio
 import json
+import logging
+import re
+import shutil
 from pathlib import Path
-from typing import Dict, Any, Optional
-from openai import OpenAI
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Set
+from document_processor.concurrency import StageLimiter
+from llm_client import LLMClient, get_default_client, tag
+from .formatter import MarkdownFormatter, MarkdownStream, ReferenceManager
+from .manifest import SectionManifest, fingerprint
 from .prompts.builder import PromptBuilder
 from .prompts.types import PromptTemplate
 from .prompts.sections import business_description
+from .sections import get_section_generator
+
+logger = logging.getLogger(__name__)
+
+# Order of the sections in the assembled report, whatever order they finish in
+SECTION_ORDER = ['business_description', 'ownership', 'compliance']
+
+# Footnote markers written by ReferenceManager, e.g. [^3]
+FOOTNOTE_PATTERN = re.compile(r'\[\^(\d+)\]')
+
+# Model and completion parameters of the business description
+REPORT_MODEL = "gpt-4"
+COMPLETION_PARAMS = {"temperature": 0.7, "max_tokens": 4000}
 
 class ReportGenerator:
     """Handles generation of report sections using OpenAI's API."""
     
-    def __init__(self, api_key: str, templates_dir: Path):
+    def __init__(self, api_key: str, templates_dir: Path, llm: Optional[LLMClient] = None):
         """
         Initialize the report generator.
         
         Args:
             api_key: OpenAI API key
             templates_dir: Directory containing templates and prompts
+            llm: Shared LLM client (default: the process-wide client for api_key)
         """
-        self.client = OpenAI(api_key=api_key)
+        self.llm = llm or get_default_client(api_key)
         self.templates_dir = templates_dir
-        
-    async def _generate_content(self, prompt: str, model: str = "gpt-4") -> str:
+        self.formatter = MarkdownFormatter()
+        # Document-driven sections; business_description is built from company data here
+        self.sections = {
+            name: get_section_generator(name, api_key, templates_dir, self.llm)
+            for name in SECTION_ORDER if name != 'business_description'
+        }
+    
+    async def _generate_content(self, prompt: str, model: str = REPORT_MODEL) -> str:
         """
         Generate content using OpenAI's API.
         
         Args:
             prompt: The complete prompt to send
             model: The model to use (default: gpt-4)
-            
+        
         Returns:
             Generated content
         """
         try:
-            response = await self.client.chat.completions.create(
+            response = await self.llm.acreate(
                 model=model,
                 messages=[
                     {"role": "system", "content": "You are a compliance and due diligence expert."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
-                max_tokens=4000
+                **COMPLETION_PARAMS,
+                stage='report'
             )
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"Error generating content: {str(e)}")
     
+    async def _stream_content(self, prompt: str, model: str = REPORT_MODEL) -> AsyncIterator[str]:
+        """Stream content for a prompt as it is generated; see _generate_content."""
+        async for chunk in self.llm.astream(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a compliance and due diligence expert."},
+                {"role": "user", "content": prompt}
+            ],
+            **COMPLETION_PARAMS,
+            stage='report'
+        ):
+            yield chunk
+    
     def _prepare_business_description_data(
         self,
         company_data: Dict[str, Any],
@@ -80,6 +120,47 @@ class ReportGenerator:
             }
         }
     
+    def _business_description_prompt(
+        self,
+        company_data: Dict[str, Any],
+        person_data: Dict[str, Any],
+        transaction_data: Dict[str, Any]
+    ) -> str:
+        """Build the business description prompt."""
+        # Prepare data
+        data = self._prepare_business_description_data(
+            company_data,
+            person_data,
+            transaction_data
+        )
+        
+        # Get template and build prompt
+        template = business_description.create_business_description_template()
+        return PromptBuilder.build_prompt(template, data)
+    
+    def _fingerprints(
+        self,
+        company_data: Dict[str, Any],
+        person_data: Dict[str, Any],
+        transaction_data: Dict[str, Any],
+        documents: Dict[str, List[dict]],
+        streamed: bool
+    ) -> Dict[str, str]:
+        """Fingerprint the inputs of every section; streamed sections are stored formatted, so they differ."""
+        template = business_description.create_business_description_template()
+        fingerprints = {
+            'business_description': fingerprint({
+                'section': 'business_description',
+                'data': self._prepare_business_description_data(company_data, person_data, transaction_data),
+                'template': PromptBuilder.compile(template).segments,
+                'model': REPORT_MODEL,
+                **COMPLETION_PARAMS
+            })
+        }
+        for name, section in self.sections.items():
+            fingerprints[name] = section.fingerprint(documents)
+        return {name: fingerprint({'inputs': value, 'streamed': streamed}) for name, value in fingerprints.items()}
+    
     async def generate_business_description(
         self,
         company_data: Dict[str, Any],
@@ -95,23 +176,15 @@ class ReportGenerator:
             person_data: Person information
             transaction_data: Transaction information
             output_path: Optional path to save the output
-            
+        
         Returns:
             Generated business description
         """
-        # Prepare data
-        data = self._prepare_business_description_data(
-            company_data,
-            person_data,
-            transaction_data
-        )
-        
-        # Get template and build prompt
-        template = business_description.create_business_description_template()
-        prompt = PromptBuilder.build_prompt(template, data)
+        prompt = self._business_description_prompt(company_data, person_data, transaction_data)
         
         # Generate content
-        content = await self._generate_content(prompt)
+        with tag(section='business_description'):
+            content = await self._generate_content(prompt)
         
         # Save if output path provided
         if output_path:
@@ -121,37 +194,75 @@ class ReportGenerator:
         
         return content
     
+    async def _generate_section(self, name: str, documents: Dict[str, List[dict]], output_path: Path) -> str:
+        """Generate a document-driven section and save it."""
+        content = await self.sections[name].agenerate(documents)
+        with open(output_path, 'w') as f:
+            f.write(content)
+        return content
+    
     async def generate_full_report(
         self,
         company_data: Dict[str, Any],
         person_data: Dict[str, Any],
         transaction_data: Dict[str, Any],
-        output_dir: Path
+        output_dir: Path,
+        documents: Optional[Dict[str, List[dict]]] = None,
+        limiter: Optional[StageLimiter] = None
     ) -> Dict[str, str]:
         """
         Generate a complete report with all sections.
         
+        Sections are independent, so they are generated concurrently and the
+        report takes about as long as its slowest section. They are assembled
+        in SECTION_ORDER regardless of completion order. A section whose inputs
+        are unchanged since it was last written to output_dir is reused from
+        disk rather than generated again.
+        
         Args:
             company_data: Company information
             person_data: Person information
             transaction_data: Transaction information
             output_dir: Directory to save report sections
-            
+            documents: Processed document summaries grouped by category
+            limiter: Limiter shared with other reports (e.g. in a batch run) bounding
+                concurrent section generation; a new one is used by default
+        
         Returns:
             Dictionary mapping section names to their content
         """
         output_dir.mkdir(parents=True, exist_ok=True)
-        sections = {}
+        documents = documents or {}
+        limiter = limiter or StageLimiter()
         
-        # Generate business description
-        sections['business_description'] = await self.generate_business_description(
-            company_data,
-            person_data,
-            transaction_data,
-            output_dir / 'business_description.md'
-        )
+        generators: Dict[str, Callable[[], Awaitable[str]]] = {
+            'business_description': lambda: self.generate_business_description(
+                company_data,
+                person_data,
+                transaction_data,
+                output_dir / 'business_description.md'
+            )
+        }
+        for name in self.sections:
+            generators[name] = lambda name=name: self._generate_section(name, documents, output_dir / f'{name}.md')
+        
+        manifest = SectionManifest(output_dir)
+        fingerprints = self._fingerprints(company_data, person_data, transaction_data, documents, streamed=False)
         
-        # TODO: Add other section generators (ownership, compliance, etc.)
+        async def run(name: str) -> str:
+            path = output_dir / f'{name}.md'
+            if manifest.current(name, fingerprints[name]):
+                logger.info("Reusing %s, its inputs are unchanged", name)
+                with open(path) as f:
+                    return f.read()
+            manifest.invalidate(name)
+            async with limiter.slot('report'):
+                content = await generators[name]()
+            manifest.record(name, fingerprints[name], path)
+            return content
+        
+        contents = await asyncio.gather(*(run(name) for name in SECTION_ORDER))
+        sections = dict(zip(SECTION_ORDER, contents))
         
         # Save full report
         full_report = "\n\n".join(sections.values())
@@ -159,3 +270,147 @@ class ReportGenerator:
             f.write(full_report)
         
         return sections
+    
+    async def _stream_section(
+        self,
+        name: str,
+        chunks: AsyncIterator[str],
+        output_path: Path,
+        references: ReferenceManager,
+        on_chunk: Optional[Callable[[str, str], None]] = None,
+        footnotes: Optional[Set[int]] = None
+    ) -> Path:
+        """
+        Format a section line by line as it streams in, appending it to its file and the callback.
+        The numbers of the footnote markers written are added to footnotes.
+        """
+        stream = MarkdownStream(self.formatter, references)
+        with open(output_path, 'w') as f:
+            async for chunk in chunks:
+                text = stream.feed(chunk)
+                if text:
+                    f.write(text)
+                    f.flush()
+                    if on_chunk:
+                        on_chunk(name, text)
+                    if footnotes is not None:
+                        footnotes.update(int(number) for number in FOOTNOTE_PATTERN.findall(text))
+            text = stream.close()
+            f.write(text)
+            if on_chunk and text:
+                on_chunk(name, text)
+            if footnotes is not None:
+                footnotes.update(int(number) for number in FOOTNOTE_PATTERN.findall(text))
+        return output_path
+    
+    def _replay_section(
+        self,
+        name: str,
+        output_path: Path,
+        section_references: Dict[str, str],
+        references: ReferenceManager,
+        on_chunk: Optional[Callable[[str, str], None]] = None,
+        footnotes: Optional[Set[int]] = None
+    ) -> Path:
+        """
+        Reuse a section streamed by an earlier run, renumbering its footnote
+        markers in this run's order. section_references maps the numbers in
+        the file to their document references; the new numbers are added to
+        footnotes.
+        """
+        def renumber(match: re.Match) -> str:
+            reference = section_references.get(match.group(1))
+            if reference is None:
+                return match.group(0)
+            marker = references.replace_references(f"[ref:{reference}]")
+            if footnotes is not None:
+                footnotes.add(references.references[reference])
+            return marker
+        
+        with open(output_path) as f:
+            text = FOOTNOTE_PATTERN.sub(renumber, f.read())
+        with open(output_path, 'w') as f:
+            f.write(text)
+        if on_chunk and text:
+            on_chunk(name, text)
+        return output_path
+    
+    async def stream_full_report(
+        self,
+        company_data: Dict[str, Any],
+        person_data: Dict[str, Any],
+        transaction_data: Dict[str, Any],
+        output_dir: Path,
+        documents: Optional[Dict[str, List[dict]]] = None,
+        limiter: Optional[StageLimiter] = None,
+        on_chunk: Optional[Callable[[str, str], None]] = None
+    ) -> Dict[str, Path]:
+        """
+        Generate a complete report, writing each section as its tokens arrive.
+        
+        Sections stream concurrently, each into its own file and, line by line,
+        to on_chunk(section name, text). Sections are never held in memory
+        whole: full_report.md is assembled from the section files in
+        SECTION_ORDER, followed by the footnotes. Footnotes are numbered in
+        the order their references arrive. Sections with unchanged inputs are
+        reused from disk, as in generate_full_report.
+        
+        Args:
+            company_data: Company information
+            person_data: Person information
+            transaction_data: Transaction information
+            output_dir: Directory to save report sections
+            documents: Processed document summaries grouped by category
+            limiter: Limiter bounding concurrent section generation
+            on_chunk: Called with each formatted piece of a section as it is written
+        
+        Returns:
+            Dictionary mapping section names to their files
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        documents = documents or {}
+        limiter = limiter or StageLimiter()
+        references = ReferenceManager()
+        
+        def chunks(name: str) -> AsyncIterator[str]:
+            if name == 'business_description':
+                prompt = self._business_description_prompt(company_data, person_data, transaction_data)
+                return self._stream_content(prompt)
+            return self.sections[name].astream(documents)
+        
+        manifest = SectionManifest(output_dir)
+        fingerprints = self._fingerprints(company_data, person_data, transaction_data, documents, streamed=True)
+        
+        async def run(name: str) -> Path:
+            path = output_dir / f'{name}.md'
+            footnotes: Set[int] = set()
+            entry = manifest.current(name, fingerprints[name])
+            if entry:
+                logger.info("Reusing %s, its inputs are unchanged", name)
+                self._replay_section(name, path, entry.get('references', {}), references, on_chunk, footnotes)
+            else:
+                manifest.invalidate(name)
+                async with limiter.slot('report'):
+                    with tag(section=name):
+                        await self._stream_section(name, chunks(name), path, references, on_chunk, footnotes)
+            # Record the section's footnotes under the numbers its file now uses
+            numbered = dict(references.footnotes)
+            manifest.record(name, fingerprints[name], path, references={
+                str(number): numbered[number] for number in sorted(footnotes) if number in numbered
+            })
+            return path
+        
+        paths = await asyncio.gather(*(run(name) for name in SECTION_ORDER))
+        sections = dict(zip(SECTION_ORDER, paths))
+        
+        # Assemble the full report from the section files
+        with open(output_dir / 'full_report.md', 'w') as full_report:
+            for i, path in enumerate(paths):
+                if i:
+                    full_report.write("\n\n")
+                with open(path) as f:
+                    shutil.copyfileobj(f, full_report)
+            if references.footnotes:
+                full_report.write(references.footnotes_text())
+        
+        return sections
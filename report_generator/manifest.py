@@ -0,0 +1,63 @@
+# report_generator/manifest.py
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+from document_processor.cache.result_cache import hash_text
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.sections.json'
+
+def fingerprint(inputs: Dict[str, Any]) -> str:
+    """Return a canonical hash of everything that determines a section's content."""
+    return hash_text(json.dumps(inputs, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str))
+
+class SectionManifest:
+    """
+    Records the input fingerprint of each section written to a report directory.
+    
+    A section whose fingerprint is unchanged and whose file is still on disk
+    is reused instead of regenerated. The manifest is rewritten atomically
+    after every change, so an interrupted run keeps the sections it finished.
+    """
+    
+    def __init__(self, output_dir: Path):
+        self.output_dir = output_dir
+        self.path = output_dir / MANIFEST_NAME
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            # A corrupt manifest only costs a full regeneration
+            logger.warning("Ignoring unreadable section manifest %s: %s", self.path, e)
+    
+    def current(self, name: str, section_fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the entry of a section that can be reused, or None if it must be generated."""
+        entry = self.entries.get(name)
+        if entry and entry.get('fingerprint') == section_fingerprint and (self.output_dir / entry['file']).exists():
+            return entry
+        return None
+    
+    def invalidate(self, name: str) -> None:
+        """Forget a section before regenerating it, so a partial file is never reused."""
+        if self.entries.pop(name, None) is not None:
+            self.save()
+    
+    def record(self, name: str, section_fingerprint: str, path: Path, **details: Any) -> None:
+        """Record a section whose file has been written completely."""
+        self.entries[name] = {'fingerprint': section_fingerprint, 'file': path.name, **details}
+        self.save()
+    
+    def save(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial manifest
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
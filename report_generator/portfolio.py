@@ -0,0 +1,171 @@
+# report_generator/portfolio.py
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from document_processor.concurrency import ConcurrencyLimits, StageLimiter
+from document_processor.data_loader import DataLoader
+from document_processor.models.company import Company
+from document_processor.ownership import OwnershipGraph
+from document_processor.processor import DocumentProcessor
+from llm_client import span
+from .report_processor import ReportProcessor
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PortfolioResult:
+    """Outcome of a batch run: report sections per company, and the companies that failed."""
+    # Section contents, or section file paths when the reports were streamed
+    reports: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    failures: Dict[str, str] = field(default_factory=dict)
+
+class PortfolioRunner:
+    """
+    Generates reports for many companies from a single load of the backoffice data.
+    
+    Structured data is loaded once and the ownership graph (with its memoized
+    chains) is shared, so each company only pays for its own documents and
+    report. Companies run concurrently up to a worker count, and all of them
+    share one stage limiter so document and report LLM concurrency stays
+    bounded overall.
+    """
+    
+    def __init__(
+        self,
+        doc_processor: DocumentProcessor,
+        report_processor: ReportProcessor,
+        output_dir: Path,
+        input_dir: Optional[Path] = None,
+        workers: int = 4,
+        limits: Optional[ConcurrencyLimits] = None,
+        stream: bool = False
+    ):
+        """
+        Initialize the runner.
+        
+        Args:
+            doc_processor: Document processor whose data loader holds the backoffice data
+            report_processor: Report processor used for every company
+            output_dir: Reports are written to output_dir/<company id>
+            input_dir: Input documents, in a <company id> subdirectory per company
+                (default: data_dir/input_documents)
+            workers: Companies processed at the same time
+            limits: Stage concurrency limits shared by all companies
+            stream: Write report sections to their files as they are generated
+        """
+        self.doc_processor = doc_processor
+        self.report_processor = report_processor
+        self.output_dir = output_dir
+        self.input_dir = input_dir or doc_processor.data_dir / 'input_documents'
+        self.workers = workers
+        self.limits = limits
+        self.stream = stream
+    
+    @property
+    def data_loader(self) -> DataLoader:
+        return self.doc_processor.data_loader
+    
+    def select_companies(
+        self,
+        company_ids: Optional[Iterable[str]] = None,
+        company_filter: Optional[Callable[[Company], bool]] = None
+    ) -> List[str]:
+        """IDs of the companies to report on: the given ones, or all loaded, narrowed by a filter."""
+        if not self.data_loader.loaded:
+            self.data_loader.load_all()
+        if company_ids is None:
+            company_ids = list(self.data_loader.companies)
+        selected = []
+        for company_id in company_ids:
+            company = self.data_loader.get_company_by_id(company_id)
+            if company is None:
+                logger.warning("Unknown company %s, skipped", company_id)
+            elif company_filter is None or company_filter(company):
+                selected.append(company_id)
+        return selected
+    
+    async def _process_documents(
+        self,
+        company_id: str,
+        limiter: StageLimiter,
+        shared_input: bool
+    ) -> Dict[str, List[dict]]:
+        """Process the company's input documents, if it has a document directory."""
+        company_input = self.input_dir / company_id
+        if not company_input.is_dir() and shared_input:
+            # Single-company layout: documents directly in the input directory
+            company_input = self.input_dir
+        if not company_input.is_dir():
+            logger.info("No input documents for company %s", company_id)
+            return {}
+        return await self.doc_processor.process_directory_async(company_input, limiter=limiter, case_id=company_id)
+    
+    async def _run_company(
+        self,
+        company_id: str,
+        graph: OwnershipGraph,
+        workers: asyncio.Semaphore,
+        limiter: StageLimiter,
+        shared_input: bool = False
+    ) -> Dict[str, Any]:
+        """Process documents and generate the report of one company."""
+        async with workers:
+            with span('company', company=company_id):
+                loader = self.data_loader
+                processed_docs = await self._process_documents(company_id, limiter, shared_input)
+                generate = self.report_processor.stream_report_async if self.stream else self.report_processor.generate_report_async
+                return await generate(
+                    processed_docs,
+                    loader.get_company_by_id(company_id),
+                    loader.get_persons_for_company(company_id),
+                    loader.get_transaction_table(company_id),
+                    graph.beneficial_owners(company_id),
+                    self.output_dir / company_id,
+                    limiter
+                )
+    
+    async def run_async(
+        self,
+        company_ids: Optional[Iterable[str]] = None,
+        company_filter: Optional[Callable[[Company], bool]] = None
+    ) -> PortfolioResult:
+        """
+        Generate reports for the selected companies concurrently.
+        
+        A failing company is logged and recorded; it does not stop the batch.
+        When a single company is selected and it has no document subdirectory,
+        the documents directly in the input directory are used.
+        """
+        selected = self.select_companies(company_ids, company_filter)
+        logger.info("Generating reports for %d companies with %d workers", len(selected), self.workers)
+        
+        graph = OwnershipGraph(self.data_loader)
+        workers = asyncio.Semaphore(self.workers)
+        limiter = StageLimiter(self.limits)
+        outcomes = await asyncio.gather(
+            *(
+                self._run_company(company_id, graph, workers, limiter, shared_input=len(selected) == 1)
+                for company_id in selected
+            ),
+            return_exceptions=True
+        )
+        
+        result = PortfolioResult()
+        for company_id, outcome in zip(selected, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Report for company %s failed: %s", company_id, outcome, exc_info=outcome)
+                result.failures[company_id] = f"{type(outcome).__name__}: {outcome}"
+            else:
+                result.reports[company_id] = outcome
+        logger.info("Generated %d reports, %d failed", len(result.reports), len(result.failures))
+        return result
+    
+    def run(
+        self,
+        company_ids: Optional[Iterable[str]] = None,
+        company_filter: Optional[Callable[[Company], bool]] = None
+    ) -> PortfolioResult:
+        """Synchronous wrapper around run_async."""
+        return asyncio.run(self.run_async(company_ids, company_filter))
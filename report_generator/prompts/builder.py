@@ -1,48 +1,71 @@
+from functools import lru_cache
 from typing import List, Dict, Any
-from .types import PromptSection, PromptTemplate
+from .types import PLACEHOLDER_PATTERN, CompiledPrompt, PromptSection, PromptTemplate
 
 class PromptBuilder:
     """Utility class for building prompts from sections and templates."""
     
     @staticmethod
-    def _build_section(section: PromptSection, data: Dict[str, Any], indent_level: int = 0) -> str:
+    def _layout_section(section: PromptSection, indent_level: int = 0) -> str:
         """
-        Build a single section of the prompt, including its subsections.
+        Lay out a single section of the prompt, including its subsections.
         
         Args:
-            section: The section to build
-            data: Data to be used in the section
+            section: The section to lay out
             indent_level: Current indentation level for formatting
         
         Returns:
-            Formatted section text
+            Formatted section text, with its placeholders left in place
         """
         # Build section header
         indent = "    " * indent_level
         lines = [f"{indent}# {section.title}"]
-        
-        # Add section content
-        for line in section.content:
-            # Replace any placeholders in the line with actual data
-            for key, value in data.items():
-                placeholder = f"{{{key}}}"
-                if placeholder in line:
-                    line = line.replace(placeholder, str(value))
-            lines.append(f"{indent}{line}")
+        lines.extend(f"{indent}{line}" for line in section.content)
         
         # Add subsections if any
-        if section.subsections:
-            for subsection in section.subsections:
-                subsection_text = PromptBuilder._build_section(
-                    subsection, 
-                    data, 
-                    indent_level + 1
-                )
-                lines.append("")  # Add spacing between sections
-                lines.append(subsection_text)
+        for subsection in section.subsections or ():
+            lines.append("")  # Add spacing between sections
+            lines.append(PromptBuilder._layout_section(subsection, indent_level + 1))
         
         return "\n".join(lines)
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def compile(template: PromptTemplate) -> CompiledPrompt:
+        """
+        Compile a template into literal segments and placeholders, once per template.
+        
+        Args:
+            template: The prompt template to compile
+        
+        Returns:
+            The compiled prompt, cached for every later call with an equal template
+        
+        Raises:
+            ValueError: If the template has placeholders that are not required data fields
+        """
+        # Each main section is followed by a blank line
+        text = "\n".join(f"{PromptBuilder._layout_section(section)}\n" for section in template.sections)
+        
+        segments, fields = [], []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            segments.append(text[position:match.start()])
+            fields.append(match.group(1))
+            position = match.end()
+        segments.append(text[position:])
+        
+        undeclared = sorted(set(fields) - set(template.required_data))
+        if undeclared:
+            raise ValueError(f"Placeholders without a required data field: {', '.join(undeclared)}")
+        
+        return CompiledPrompt(
+            segments=tuple(segments),
+            fields=tuple(fields),
+            required_data=template.required_data,
+            description=template.description
+        )
+    
     @staticmethod
     def build_prompt(template: PromptTemplate, data: Dict[str, Any]) -> str:
         """
@@ -51,26 +74,14 @@ class PromptBuilder:
         Args:
             template: The prompt template to use
             data: Data to be used in the prompt
-            
+        
         Returns:
             Complete formatted prompt
         
         Raises:
             ValueError: If required data is missing
         """
-        # Validate data
-        if not template.validate_data(data):
-            missing = [field for field in template.required_data if field not in data]
-            raise ValueError(f"Missing required data fields: {', '.join(missing)}")
-        
-        # Build each section
-        sections_text = []
-        for section in template.sections:
-            section_text = PromptBuilder._build_section(section, data)
-            sections_text.append(section_text)
-            sections_text.append("")  # Add spacing between main sections
-        
-        return "\n".join(sections_text)
+        return PromptBuilder.compile(template).render(data)
     
     @staticmethod
     def create_section(
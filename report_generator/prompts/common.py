@@ -1,7 +1,11 @@
+from functools import lru_cache
 from typing import List
 from .types import PromptSection
 from .builder import PromptBuilder
 
+# Sections are immutable, so each is built once and shared by every prompt
+
+@lru_cache(maxsize=None)
 def create_writing_guidelines() -> PromptSection:
     """Create the writing guidelines section."""
     return PromptBuilder.create_section(
@@ -30,6 +34,7 @@ def create_writing_guidelines() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_data_integration() -> PromptSection:
     """Create the data integration guidelines section."""
     return PromptBuilder.create_section(
@@ -45,6 +50,7 @@ def create_data_integration() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_data_verification() -> PromptSection:
     """Create the data verification requirements section."""
     return PromptBuilder.create_section(
@@ -60,6 +66,7 @@ def create_data_verification() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_footnotes() -> PromptSection:
     """Create the footnotes handling section."""
     return PromptBuilder.create_section(
@@ -75,6 +82,7 @@ def create_footnotes() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_final_review() -> PromptSection:
     """Create the final review checklist section."""
     return PromptBuilder.create_section(
@@ -102,6 +110,7 @@ def create_data_provided(data: dict) -> PromptSection:
         content=content
     )
 
+@lru_cache(maxsize=None)
 def create_important_notes() -> PromptSection:
     """Create the important notes section."""
     return PromptBuilder.create_section(
@@ -117,6 +126,7 @@ def create_important_notes() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_reminder(section_name: str) -> PromptSection:
     """Create a section-specific reminder."""
     return PromptBuilder.create_section(
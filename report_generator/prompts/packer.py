@@ -0,0 +1,252 @@
+# report_generator/prompts/packer.py
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from llm_client import count_tokens
+from .serializer import DocumentSerializer, collect_facts, compact_json
+
+# Share of the budget kept for the manifest of omitted documents
+MANIFEST_SHARE = 0.1
+
+@dataclass
+class OmittedDocument:
+    """A document left out of a packed context, listed in its manifest."""
+    category: str
+    number: int  # 1-based, within its category
+    tokens: int
+    document_date: Optional[date] = None
+    digest: str = ''  # Its first facts, so the model knows what it is missing
+
+@dataclass
+class PackedContext:
+    """Documents serialized to fit a token budget, with what had to be left out."""
+    text: str
+    tokens_before: int  # As json.dumps(indent=2) of every document
+    tokens_after: int
+    facts: int = 0
+    duplicates: int = 0  # Facts dropped because another document already stated them
+    included: Dict[str, List[int]] = field(default_factory=dict)
+    omitted: List[OmittedDocument] = field(default_factory=list)
+    truncated: List[Tuple[str, int]] = field(default_factory=list)
+    
+    @property
+    def savings(self) -> float:
+        return 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+def document_date(document: dict) -> Optional[date]:
+    """The most recent date in a document's top-level *date fields, used for recency."""
+    latest = None
+    for key, value in document.items():
+        if key.endswith('date') and isinstance(value, str):
+            try:
+                parsed = date.fromisoformat(value[:10])
+            except ValueError:
+                continue
+            latest = max(latest, parsed) if latest else parsed
+    return latest
+
+class ContextPacker:
+    """
+    Fits section documents into a token budget.
+    
+    Documents are ranked by the relevance of their category (its position in
+    the section's required categories) and then by recency, and added while
+    they fit. A most relevant document that is too large on its own is
+    truncated to its first facts instead. Everything left out is listed in an
+    "omitted" manifest with a short digest. The returned text is always within
+    the budget, counted with the same tokenizer as the model.
+    """
+    
+    def __init__(
+        self,
+        budget_tokens: int,
+        serializer: Optional[DocumentSerializer] = None,
+        digest_chars: int = 120
+    ):
+        """
+        Initialize the packer.
+        
+        Args:
+            budget_tokens: Maximum tokens of the packed text, manifest included
+            serializer: Serializer for the included documents
+            digest_chars: Length of the digest of each omitted document
+        """
+        self.budget_tokens = budget_tokens
+        self.serializer = serializer or DocumentSerializer()
+        self.digest_chars = digest_chars
+    
+    def _count(self, text: str) -> int:
+        return count_tokens(text, self.serializer.model)
+    
+    def _digest(self, document: dict) -> str:
+        facts = collect_facts([document])
+        text = '; '.join(f"{fact.path}: {fact.value if isinstance(fact.value, str) else compact_json(fact.value)}" for fact in facts[:5])
+        return text if len(text) <= self.digest_chars else text[:self.digest_chars - 3] + '...'
+    
+    def _render(self, documents: Dict[str, List[dict]], included: Dict[str, List[int]]) -> Tuple[str, int, int]:
+        """Render the included documents; returns (text, facts emitted, duplicates dropped)."""
+        parts = []
+        fact_count = duplicates = 0
+        for category, numbers in included.items():
+            if numbers:
+                docs = [documents[category][number - 1] for number in numbers]
+                text, facts, dropped = self.serializer.render_category(category, docs, numbers)
+                parts.append(text)
+                fact_count += facts
+                duplicates += dropped
+        return '\n\n'.join(parts), fact_count, duplicates
+    
+    def _join(self, *parts: str) -> str:
+        """Join the non-empty parts, after the serializer's legend when documents are shown."""
+        parts = tuple(part for part in parts if part)
+        if parts and self.serializer.legend:
+            parts = (self.serializer.legend, *parts)
+        return '\n\n'.join(parts)
+    
+    def _manifest(self, omitted: List[OmittedDocument], budget: int) -> str:
+        """List omitted documents, falling back to per-category counts when the list does not fit."""
+        if not omitted:
+            return ''
+        lines = [f"### Omitted documents ({len(omitted)}, not shown for length)"]
+        for document in omitted:
+            dated = f", dated {document.document_date}" if document.document_date else ''
+            lines.append(f"- {document.category} {document.number} ({document.tokens} tokens{dated}): {document.digest}")
+        manifest = '\n'.join(lines)
+        if self._count(manifest) <= budget:
+            return manifest
+        counts: Dict[str, int] = {}
+        for document in omitted:
+            counts[document.category] = counts.get(document.category, 0) + 1
+        return lines[0] + '\n' + ', '.join(f"{category}: {count}" for category, count in counts.items())
+    
+    def _truncate(self, category: str, document: dict, number: int, budget: int) -> str:
+        """Render as many of a document's leading facts as fit the budget, cutting the last one short."""
+        facts = collect_facts([document], [number])
+        
+        def render(count: int, cut: Optional[int] = None) -> str:
+            kept: Dict[str, list] = {}
+            for i, fact in enumerate(facts[:count]):
+                value = fact.value
+                if cut is not None and i == count - 1:
+                    value = (value if isinstance(value, str) else compact_json(value))[:cut] + '...'
+                kept.setdefault(fact.path, []).append(value)
+            return self.serializer.render_category(category, [kept], [number])[0] + "\n(truncated)"
+        
+        def fits(text: str) -> bool:
+            return self._count(text) <= budget
+        
+        # Binary search on the number of leading facts that fit whole...
+        low, high = 0, len(facts)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if fits(render(middle)):
+                low = middle
+            else:
+                high = middle - 1
+        if low == len(facts):
+            return render(low)
+        
+        # ...then on how much of the next one fits
+        first, last = 0, len(compact_json(facts[low].value))
+        while first < last:
+            middle = (first + last + 1) // 2
+            if fits(render(low + 1, middle)):
+                first = middle
+            else:
+                last = middle - 1
+        return render(low + 1, first) if first else render(low)
+    
+    def pack(self, documents: Dict[str, List[dict]], categories: Optional[List[str]] = None) -> PackedContext:
+        """
+        Pack documents into the budget.
+        
+        Args:
+            documents: Documents grouped by category
+            categories: Categories from most to least relevant (default: the order of documents)
+        
+        Returns:
+            The packed context; its tokens_after never exceed budget_tokens
+        """
+        categories = [category for category in (categories or list(documents)) if documents.get(category)]
+        tokens_before = self.serializer.baseline_tokens({category: documents[category] for category in categories})
+        everything = {category: list(range(1, len(documents[category]) + 1)) for category in categories}
+        body, facts, duplicates = self._render(documents, everything)
+        full = self._join(body)
+        full_tokens = self._count(full)
+        if full_tokens <= self.budget_tokens:
+            return PackedContext(
+                text=full,
+                tokens_before=tokens_before,
+                tokens_after=full_tokens,
+                facts=facts,
+                duplicates=duplicates,
+                included=everything
+            )
+        
+        # Rank by category relevance, then newest first, then document order
+        candidates = []
+        for rank, category in enumerate(categories):
+            for number, document in enumerate(documents[category], 1):
+                dated = document_date(document) if isinstance(document, dict) else None
+                candidates.append((rank, -(dated.toordinal() if dated else 0), number, category, dated))
+        candidates.sort()
+        
+        reserve = int(self.budget_tokens * MANIFEST_SHARE)
+        legend_tokens = self._count(self.serializer.legend) + 2 if self.serializer.legend else 0
+        available = self.budget_tokens - reserve - legend_tokens
+        included: Dict[str, List[int]] = {category: [] for category in categories}
+        omitted: List[OmittedDocument] = []
+        truncated_text = ''
+        truncated: List[Tuple[str, int]] = []
+        used = 0
+        costs: Dict[Tuple[str, int], int] = {}
+        for _, _, number, category, dated in candidates:
+            document = documents[category][number - 1]
+            # Rendered alone; deduplication against other documents only makes it smaller
+            cost = costs[category, number] = self._count(self.serializer.render_category(category, [document], [number])[0]) + 2
+            if used + cost <= available:
+                included[category].append(number)
+                used += cost
+            elif used == 0 and not truncated:
+                truncated_text = self._truncate(category, document, number, available)
+                truncated.append((category, number))
+                used = self._count(truncated_text) + 2
+            else:
+                omitted.append(OmittedDocument(category, number, cost, dated, self._digest(document) if isinstance(document, dict) else ''))
+        
+        for numbers in included.values():
+            numbers.sort()
+        while True:
+            rendered, facts, duplicates = self._render(documents, included)
+            body = self._join(truncated_text, rendered)
+            # The manifest may use whatever the body leaves
+            manifest = self._manifest(omitted, self.budget_tokens - (self._count(body) + 2 if body else 0))
+            text = '\n\n'.join(part for part in (body, manifest) if part)
+            tokens = self._count(text)
+            if tokens <= self.budget_tokens:
+                break
+            # Per-document costs are estimates; drop the least relevant included document until it fits
+            last = next((candidate for candidate in reversed(candidates) if candidate[2] in included[candidate[3]]), None)
+            if last is not None:
+                _, _, number, category, dated = last
+                included[category].remove(number)
+            elif truncated:
+                category, number = truncated.pop()
+                truncated_text = ''
+                dated = document_date(documents[category][number - 1])
+            else:
+                # Not even the manifest fits
+                text, tokens, facts, duplicates = '', 0, 0, 0
+                break
+            omitted.append(OmittedDocument(category, number, costs[category, number], dated, self._digest(documents[category][number - 1])))
+        
+        return PackedContext(
+            text=text,
+            tokens_before=tokens_before,
+            tokens_after=tokens,
+            facts=facts,
+            duplicates=duplicates,
+            included={category: numbers for category, numbers in included.items() if numbers},
+            omitted=omitted,
+            truncated=truncated
+        )
@@ -1,8 +1,10 @@
+from functools import lru_cache
 from typing import List
 from ..types import PromptSection, PromptTemplate
 from ..builder import PromptBuilder
 from .. import common
 
+@lru_cache(maxsize=None)
 def create_business_description_structure() -> PromptSection:
     """Create the business description structure section."""
     return PromptBuilder.create_section(
@@ -58,6 +60,7 @@ def create_business_description_structure() -> PromptSection:
         ]
     )
 
+@lru_cache(maxsize=None)
 def create_business_description_template() -> PromptTemplate:
     """Create the complete business description template."""
     sections = [
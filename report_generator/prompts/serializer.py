@@ -0,0 +1,136 @@
+# report_generator/prompts/serializer.py
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from llm_client import count_tokens
+
+# Values that carry no information for the model
+EMPTY_VALUES = (None, '', [], {})
+
+def prune(value: Any) -> Any:
+    """Recursively drop null and empty fields and items; returns None if nothing is left."""
+    if isinstance(value, dict):
+        pruned = {key: prune(item) for key, item in value.items()}
+        pruned = {key: item for key, item in pruned.items() if item not in EMPTY_VALUES}
+        return pruned or None
+    if isinstance(value, list):
+        pruned = [prune(item) for item in value]
+        pruned = [item for item in pruned if item not in EMPTY_VALUES]
+        return pruned or None
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+def iter_facts(document: Dict[str, Any], prefix: str = '') -> List[Tuple[str, Any]]:
+    """
+    Split a pruned document into (field path, value) facts.
+    
+    Nested objects are flattened into dotted paths and every list item is its
+    own fact, so the same shareholder listed by two documents is one fact
+    whatever its position in either list.
+    """
+    facts = []
+    for key, value in document.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            facts.extend(iter_facts(value, path))
+        elif isinstance(value, list):
+            facts.extend((path, item) for item in value)
+        else:
+            facts.append((path, value))
+    return facts
+
+@dataclass
+class Fact:
+    """A field value and the documents (1-based, within their category) that state it."""
+    path: str
+    value: Any
+    sources: List[int]
+
+def collect_facts(documents: List[dict], numbers: Optional[List[int]] = None) -> List[Fact]:
+    """
+    Deduplicate the facts of a category's documents, in first-seen order.
+    
+    Documents are numbered from 1 unless their numbers are given, e.g. when
+    only some documents of a category are serialized.
+    """
+    facts: Dict[Tuple[str, str], Fact] = {}
+    for number, document in zip(numbers or range(1, len(documents) + 1), documents):
+        pruned = prune(document) if isinstance(document, dict) else None
+        if pruned is None:
+            continue
+        for path, value in iter_facts(pruned):
+            key = (path, compact_json(value))
+            if key in facts:
+                if facts[key].sources[-1] != number:
+                    facts[key].sources.append(number)
+            else:
+                facts[key] = Fact(path, value, [number])
+    return list(facts.values())
+
+class DocumentSerializer:
+    """
+    Serializes processed documents compactly for section prompts.
+    
+    Null and empty fields are dropped, and a fact stated by several documents
+    of a category is emitted once with the numbers of all documents stating
+    it, e.g. ``directors: {"name":"A B"} [1,3]``. Two styles are available:
+    "kv" writes one ``path: value [sources]`` line per fact, "json" writes one
+    compact JSON array of ``[path, value, sources]`` per category.
+    Categories are rendered by ContextPacker, which fits them into a
+    section's token budget and reports the savings.
+    """
+    
+    STYLES = ('kv', 'json')
+    
+    # Put before json output, whose arrays do not name their columns
+    JSON_LEGEND = "Facts are [field, value, source document numbers]."
+    
+    def __init__(self, style: str = 'kv', model: str = 'gpt-4'):
+        if style not in self.STYLES:
+            raise ValueError(f"Unknown serialization style: {style}")
+        self.style = style
+        self.model = model
+    
+    def _render_kv(self, facts: List[Fact], show_sources: bool) -> List[str]:
+        lines = []
+        for fact in facts:
+            # Multi-line strings are quoted so every fact stays on one line
+            value = fact.value if isinstance(fact.value, str) and '\n' not in fact.value else compact_json(fact.value)
+            sources = f" [{','.join(map(str, fact.sources))}]" if show_sources else ''
+            lines.append(f"{fact.path}: {value}{sources}")
+        return lines
+    
+    def _render_json(self, facts: List[Fact]) -> List[str]:
+        return [compact_json([[fact.path, fact.value, fact.sources] for fact in facts])]
+    
+    @property
+    def legend(self) -> str:
+        """Explanation that precedes the rendered categories, if the style needs one."""
+        return self.JSON_LEGEND if self.style == 'json' else ''
+    
+    def baseline_tokens(self, documents: Dict[str, List[dict]]) -> int:
+        """Tokens of the documents as json.dumps(indent=2), the format this serializer replaces."""
+        before = '\n'.join(json.dumps(doc, indent=2, default=str) for docs in documents.values() for doc in docs)
+        return count_tokens(before, self.model)
+    
+    def render_category(
+        self,
+        category: str,
+        documents: List[dict],
+        numbers: Optional[List[int]] = None
+    ) -> Tuple[str, int, int]:
+        """Render one category; returns (text, facts emitted, duplicates dropped)."""
+        facts = collect_facts(documents, numbers)
+        stated = sum(len(fact.sources) for fact in facts)
+        count = f"{len(documents)} document{'s' if len(documents) != 1 else ''}"
+        header = f"### {category.replace('_', ' ').title()} ({count})"
+        if self.style == 'kv':
+            # Sources only matter when there is more than one document to tell apart
+            body = self._render_kv(facts, len(documents) > 1 or (numbers is not None and list(numbers) != [1]))
+        else:
+            body = self._render_json(facts)
+        return '\n'.join([header, *body]), len(facts), stated - len(facts)
@@ -1,20 +1,64 @@
+import re
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any
 
-@dataclass
+# A placeholder is a field name in braces, e.g. {company_name}
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+@dataclass(frozen=True)
 class PromptSection:
     """Represents a section of a prompt with title, content, and optional subsections."""
     title: str
-    content: List[str]
-    subsections: Optional[List['PromptSection']] = None
+    content: Tuple[str, ...]
+    subsections: Optional[Tuple['PromptSection', ...]] = None
+    
+    def __post_init__(self):
+        # Immutable and hashable, so sections can be cached and shared
+        object.__setattr__(self, 'content', tuple(self.content))
+        if self.subsections is not None:
+            object.__setattr__(self, 'subsections', tuple(self.subsections))
 
-@dataclass
+@dataclass(frozen=True)
 class PromptTemplate:
     """Represents a complete prompt template with sections and data requirements."""
-    sections: List[PromptSection]
-    required_data: List[str]  # List of required data fields
+    sections: Tuple[PromptSection, ...]
+    required_data: Tuple[str, ...]  # Required data fields
     description: str  # Description of what this prompt template is for
     
+    def __post_init__(self):
+        object.__setattr__(self, 'sections', tuple(self.sections))
+        object.__setattr__(self, 'required_data', tuple(self.required_data))
+    
     def validate_data(self, data: Dict[str, Any]) -> bool:
         """Validate that all required data fields are present."""
         return all(field in data for field in self.required_data)
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """
+    A template laid out once into literal segments and the placeholders between them.
+    
+    segments has one more item than fields: rendering interleaves them, so a
+    prompt is built in a single pass whatever the number of lines and fields.
+    """
+    segments: Tuple[str, ...]
+    fields: Tuple[str, ...]
+    required_data: Tuple[str, ...]
+    description: str
+    
+    def render(self, data: Dict[str, Any]) -> str:
+        """
+        Fill the placeholders with data.
+        
+        Raises:
+            ValueError: If required data is missing
+        """
+        missing = [field for field in self.required_data if field not in data]
+        if missing:
+            raise ValueError(f"Missing required data fields: {', '.join(missing)}")
+        
+        parts = [self.segments[0]]
+        for field, segment in zip(self.fields, self.segments[1:]):
+            parts.append(str(data[field]))
+            parts.append(segment)
+        return ''.join(parts)
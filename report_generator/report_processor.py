@@ -1,13 +1,20 @@
+import asyncio
+import logging
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Union
+from document_processor.concurrency import StageLimiter
+from document_processor.transactions import TransactionTable
+from llm_client import LLMClient
 from .generator import ReportGenerator
 
+logger = logging.getLogger(__name__)
+
 class ReportProcessor:
     """Main class for generating reports from processed documents."""
     
-    def __init__(self, api_key: str, templates_dir: Path, output_dir: Path):
+    def __init__(self, api_key: str, templates_dir: Path, output_dir: Path, llm: Optional[LLMClient] = None):
         """Initialize the report processor."""
-        self.generator = ReportGenerator(api_key, templates_dir)
+        self.generator = ReportGenerator(api_key, templates_dir, llm)
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
@@ -15,7 +22,8 @@ class ReportProcessor:
         """Prepare company information for report generation."""
         return {
             "name": company_data.name if hasattr(company_data, 'name') else company_data["name"],
-            "legal_structure": company_data.legal_structure if hasattr(company_data, 'legal_structure') else company_data["legal_structure"],
+            # The Company model records its legal form as business_type
+            "legal_structure": company_data.business_type if hasattr(company_data, 'business_type') else company_data["legal_structure"],
             "incorporation_date": company_data.registration_date if hasattr(company_data, 'registration_date') else company_data["incorporation_date"],
             "incorporation_place": company_data.country if hasattr(company_data, 'country') else company_data["incorporation_place"],
             "registration_numbers": [company_data.registration_number] if hasattr(company_data, 'registration_number') and company_data.registration_number else [],
@@ -47,22 +55,19 @@ class ReportProcessor:
             "identification": p.passport_number
         } for p in persons] if persons else []
     
-    def _prepare_transaction_info(self, transactions: List[dict]) -> List[dict]:
-        """Prepare transaction information for report generation."""
-        return [{
-            "type": t.get("type", ""),
-            "amount": t.get("amount", 0),
-            "currency": t.get("currency", ""),
-            "date": t.get("date", ""),
-            "counterparty": t.get("counterparty", "")
-        } for t in transactions]
+    def _prepare_transaction_info(self, transactions: Union[List[dict], TransactionTable]) -> dict:
+        """Summarize transactions into aggregates for report generation."""
+        if not isinstance(transactions, TransactionTable):
+            transactions = TransactionTable.from_records(transactions)
+        return transactions.summary()
     
     def prepare_report_data(
         self,
         processed_docs: Dict[str, List[dict]],
         company_data: Any,
         persons: List[Any],
-        transactions: List[dict]
+        transactions: Union[List[dict], TransactionTable],
+        beneficial_owners: Optional[List[Any]] = None
     ) -> dict:
         """Prepare all data needed for report generation."""
         # Prepare basic information
@@ -79,34 +84,119 @@ class ReportProcessor:
         return {
             "company_data": company_info,
             "person_data": person_info,
-            "transaction_data": transaction_info
+            "transaction_data": transaction_info,
+            # Effective ownership computed from the share chains, so the LLM does no arithmetic
+            "ownership_data": [owner.to_dict() for owner in beneficial_owners or []]
         }
     
-    def generate_report(
+    async def generate_report_async(
         self,
         processed_docs: Dict[str, List[dict]],
         company_data: Any,
         persons: List[Any],
-        transactions: List[dict]
+        transactions: Union[List[dict], TransactionTable],
+        beneficial_owners: Optional[List[Any]] = None,
+        output_dir: Optional[Path] = None,
+        limiter: Optional[StageLimiter] = None
     ) -> Dict[str, str]:
-        """Generate a complete report with all sections."""
-        print("\nGenerating EDD report...")
+        """
+        Generate a complete report with all sections.
+        
+        Args:
+            processed_docs: Section summaries grouped by category
+            company_data: Company model or dict
+            persons: Persons of the company
+            transactions: Transactions of the company
+            beneficial_owners: Effective owners from the ownership graph
+            output_dir: Directory for the report files (default: the processor's output_dir)
+            limiter: Concurrency limiter shared with other reports being generated
+        
+        Returns:
+            Dictionary mapping section names to their content
+        """
+        logger.info("Generating EDD report...")
         
         # Prepare report data
         report_data = self.prepare_report_data(
             processed_docs,
             company_data,
             persons,
-            transactions
+            transactions,
+            beneficial_owners
         )
         
         # Generate report sections
-        sections = self.generator.generate_full_report(
+        sections = await self.generator.generate_full_report(
             report_data["company_data"],
             report_data["person_data"],
             report_data["transaction_data"],
-            self.output_dir
+            output_dir or self.output_dir,
+            # Sections read the computed ownership like any other document category
+            documents={**processed_docs, "beneficial_owners": report_data["ownership_data"]},
+            limiter=limiter
         )
         
-        print("\nReport generation complete!")
+        logger.info("Report generation complete!")
         return sections
+    
+    async def stream_report_async(
+        self,
+        processed_docs: Dict[str, List[dict]],
+        company_data: Any,
+        persons: List[Any],
+        transactions: Union[List[dict], TransactionTable],
+        beneficial_owners: Optional[List[Any]] = None,
+        output_dir: Optional[Path] = None,
+        limiter: Optional[StageLimiter] = None,
+        on_chunk: Optional[Callable[[str, str], None]] = None
+    ) -> Dict[str, Path]:
+        """
+        Generate a complete report, writing each section as it streams in.
+        
+        Takes the same arguments as generate_report_async, plus on_chunk, which is
+        called with (section name, text) for every formatted piece of output.
+        
+        Returns:
+            Dictionary mapping section names to their files
+        """
+        logger.info("Streaming EDD report...")
+        
+        report_data = self.prepare_report_data(
+            processed_docs,
+            company_data,
+            persons,
+            transactions,
+            beneficial_owners
+        )
+        
+        sections = await self.generator.stream_full_report(
+            report_data["company_data"],
+            report_data["person_data"],
+            report_data["transaction_data"],
+            output_dir or self.output_dir,
+            documents={**processed_docs, "beneficial_owners": report_data["ownership_data"]},
+            limiter=limiter,
+            on_chunk=on_chunk
+        )
+        
+        logger.info("Report generation complete!")
+        return sections
+    
+    def generate_report(
+        self,
+        processed_docs: Dict[str, List[dict]],
+        company_data: Any,
+        persons: List[Any],
+        transactions: Union[List[dict], TransactionTable],
+        beneficial_owners: Optional[List[Any]] = None,
+        output_dir: Optional[Path] = None
+    ) -> Dict[str, str]:
+        """Synchronous wrapper around generate_report_async."""
+        return asyncio.run(self.generate_report_async(
+            processed_docs,
+            company_data,
+            persons,
+            transactions,
+            beneficial_owners,
+            output_dir
+        ))
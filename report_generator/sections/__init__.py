@@ -1,10 +1,12 @@
 # report_generator/sections/__init__.py
 from pathlib import Path
+from typing import Optional
+from llm_client import LLMClient
 from .business_description import BusinessDescriptionSection
 from .ownership_section import OwnershipSection
 from .compliance_section import ComplianceSection
 
-def get_section_generator(section_type: str, api_key: str, templates_dir: Path):
+def get_section_generator(section_type: str, api_key: str, templates_dir: Path, llm: Optional[LLMClient] = None):
     """Factory function to get appropriate section generator."""
     generators = {
         'business_description': BusinessDescriptionSection,
@@ -15,4 +17,4 @@ def get_section_generator(section_type: str, api_key: str, templates_dir: Path):
     if section_type not in generators:
         raise ValueError(f"Unknown section type: {section_type}")
     
-    return generators[section_type](api_key, templates_dir)
+    return generators[section_type](api_key, templates_dir, llm)
@@ -1,18 +1,54 @@
 # report_generator/sections/base_section.py
 from abc import ABC, abstractmethod
-from typing import List, Dict
-import openai
-import json
+from functools import lru_cache
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import logging
 from pathlib import Path
+from document_processor.cache.result_cache import hash_text
+from llm_client import LLMClient, count_tokens, get_default_client, tag
+from ..manifest import fingerprint
+from ..prompts.packer import ContextPacker
+from ..prompts.serializer import DocumentSerializer
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS_PLACEHOLDER = "{documents}"
+
+# Tokens kept free for message framing and the "## Documents" heading
+PROMPT_MARGIN = 64
+
+@lru_cache(maxsize=None)
+def load_template(path: Path, model: str) -> Tuple[str, int]:
+    """Read a section prompt template once per process; returns its text and token count."""
+    with open(path) as f:
+        template = f.read()
+    return template, count_tokens(template, model)
 
 class BaseSection(ABC):
     """Base class for report sections."""
     
-    def __init__(self, api_key: str, templates_dir: Path):
-        self.client = openai.OpenAI(api_key=api_key)
+    model = "gpt-4"
+    
+    def __init__(
+        self,
+        api_key: str,
+        templates_dir: Path,
+        llm: Optional[LLMClient] = None,
+        serializer: Optional[DocumentSerializer] = None,
+        context_window: int = 8192,
+        completion_tokens: int = 1500
+    ):
+        self.llm = llm or get_default_client(api_key)
+        self.serializer = serializer or DocumentSerializer()
         self.template_path = templates_dir / "prompts" / f"{self.section_name}.txt"
-        with open(self.template_path) as f:
-            self.template = f.read()
+        self.template, template_tokens = load_template(self.template_path, self.serializer.model)
+        self.template_hash = hash_text(self.template)
+        self.completion_tokens = completion_tokens
+        # Documents get whatever the template and the completion leave of the context window
+        budget = context_window - completion_tokens - template_tokens - PROMPT_MARGIN
+        if budget <= 0:
+            raise ValueError(f"The {self.section_name} template and completion do not fit a {context_window}-token context window")
+        self.packer = ContextPacker(budget, self.serializer)
     
     @property
     @abstractmethod
@@ -26,30 +62,88 @@ class BaseSection(ABC):
         """Returns list of document categories needed for this section."""
         pass
     
-    def generate(self, documents: Dict[str, List[dict]]) -> str:
-        """Generates the section content using relevant documents."""
-        # Filter documents to only those needed for this section
-        relevant_docs = {
+    def _relevant_documents(self, documents: Dict[str, List[dict]]) -> Dict[str, List[dict]]:
+        """Filter documents to only those needed for this section."""
+        return {
             cat: docs for cat, docs in documents.items() 
             if cat in self.required_categories
         }
+    
+    def fingerprint(self, documents: Dict[str, List[dict]]) -> str:
+        """Hash of every input of the section; it is only regenerated when this changes."""
+        return fingerprint({
+            'section': self.section_name,
+            'documents': {cat: documents.get(cat) or [] for cat in self.required_categories},
+            'template': self.template_hash,
+            'model': self.model,
+            'serialization': self.serializer.style,
+            'budget_tokens': self.packer.budget_tokens,
+            'completion_tokens': self.completion_tokens
+        })
+    
+    def _build_prompt(self, documents: Dict[str, List[dict]]) -> str:
+        """Builds the section prompt from the documents it needs."""
+        relevant_docs = self._relevant_documents(documents)
+        
+        # Generate section using template and filtered documents; templates
+        # without a placeholder get the documents appended
+        documents_text = self._format_documents(relevant_docs)
+        if DOCUMENTS_PLACEHOLDER in self.template:
+            return self.template.replace(DOCUMENTS_PLACEHOLDER, documents_text)
+        return f"{self.template.rstrip()}\n\n## Documents\n\n{documents_text}"
+    
+    def generate(self, documents: Dict[str, List[dict]]) -> str:
+        """Generates the section content using relevant documents."""
+        prompt = self._build_prompt(documents)
         
-        # Generate section using template and filtered documents
-        prompt = self.template.format(documents=self._format_documents(relevant_docs))
+        with tag(section=self.section_name):
+            response = self.llm.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.completion_tokens,
+                stage='report'
+            )
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}]
-        )
+        return response.choices[0].message.content
+    
+    async def agenerate(self, documents: Dict[str, List[dict]]) -> str:
+        """Async variant of generate, so sections can be generated concurrently."""
+        prompt = self._build_prompt(documents)
+        
+        with tag(section=self.section_name):
+            response = await self.llm.acreate(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.completion_tokens,
+                stage='report'
+            )
         
         return response.choices[0].message.content
     
+    async def astream(self, documents: Dict[str, List[dict]]) -> AsyncIterator[str]:
+        """Streams the section content as the model produces it."""
+        prompt = self._build_prompt(documents)
+        
+        with tag(section=self.section_name):
+            async for chunk in self.llm.astream(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=self.completion_tokens,
+                stage='report'
+            ):
+                yield chunk
+    
     def _format_documents(self, documents: Dict[str, List[dict]]) -> str:
-        """Format documents for inclusion in prompt."""
-        formatted = []
-        for category, docs in documents.items():
-            formatted.append(f"\n### {category.replace('_', ' ').title()}")
-            for i, doc in enumerate(docs, 1):
-                formatted.append(f"\nDocument {i}:")
-                formatted.append(json.dumps(doc, indent=2))
-        return "\n".join(formatted)
+        """Format documents for inclusion in prompt, packed into the section's token budget."""
+        packed = self.packer.pack(documents, self.required_categories)
+        if packed.omitted or packed.truncated:
+            logger.warning(
+                "%s documents: %d omitted and %d truncated to fit %d tokens",
+                self.section_name, len(packed.omitted), len(packed.truncated), self.packer.budget_tokens
+            )
+        logger.info(
+            "%s documents: %d included, %d facts (%d duplicates dropped), %d -> %d tokens (%.0f%% saved)",
+            self.section_name, sum(len(numbers) for numbers in packed.included.values()),
+            packed.facts, packed.duplicates, packed.tokens_before, packed.tokens_after, packed.savings * 100
+        )
+        return packed.text
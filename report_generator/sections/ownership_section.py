@@ -12,5 +12,6 @@ class OwnershipSection(BaseSection):
     def required_categories(self) -> List[str]:
         return [
             "ownership_control",
-            "identity_verification"
+            "identity_verification",
+            "beneficial_owners"  # Effective ownership computed from the share register
         ]